@@ -21,11 +21,50 @@ class Settings(BaseSettings):
     
     # Vector Store
     VECTOR_STORE_PATH: str = "./vector_store"
-    CHUNK_SIZE: int = 1000
-    CHUNK_OVERLAP: int = 200
+    CHUNK_SIZE: int = 800  # Smaller chunks for better precision on policy documents
+    CHUNK_OVERLAP: int = 100
+    VECTOR_STORE_CACHE_MB: int = 512  # Memory budget for loaded vector stores
+    VECTOR_INDEX_MMAP: bool = True  # Open the saved global index memory-mapped, so every worker shares one page-cache copy
+    VECTOR_INDEX_TYPE: str = "flat"  # Global index partitions: flat (exact), hnsw or ivfpq (approximate)
+    ANN_MIN_VECTORS: int = 20000  # Partitions smaller than this stay flat
+    ANN_TOMBSTONE_RATIO: float = 0.2  # Rebuild an HNSW partition once this share of its vectors is deleted
+    HNSW_M: int = 32  # Graph neighbours per vector
+    HNSW_EF_CONSTRUCTION: int = 80
+    HNSW_EF_SEARCH: int = 64  # Default search breadth, overridable per request
+    IVF_NLIST: int = 0  # Inverted lists per partition, 0 = 4 * sqrt(vectors)
+    IVF_PQ_M: int = 48  # Product quantizer sub-vectors, must divide the embedding dimension
+    IVF_NPROBE: int = 8  # Default lists scanned per query, overridable per request
+    IVF_TRAINING_SAMPLE: int = 50000  # Vectors sampled to train IVF centroids and PQ codebooks
+    
+    # Hybrid retrieval
+    HYBRID_SEARCH_ENABLED: bool = False  # Opt-in: fuse BM25 keyword hits with vector hits (reciprocal rank fusion), changes result ranking
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    RRF_K: int = 60  # Rank fusion constant, higher flattens the advantage of top ranks
+    HYBRID_PREFILTER_STORES: int = 0  # On scopes with more versions than this, vector-search only the best BM25 matches, 0 = off
+    
+    # Background ingestion
+    INGESTION_POLL_INTERVAL: float = 10.0  # Seconds between uploads tree checks
+    INGESTION_WORKERS: int = 0  # Extraction processes, 0 = one per CPU core
+    EMBEDDING_BATCH_SIZE: int = 256  # Chunks embedded per model call, across documents
+    STREAMING_INGEST_THRESHOLD_MB: int = 20  # Larger files are streamed page by page instead of pooled
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_PATH: str = "./vector_store/extraction_cache"
+    UPLOAD_WORKERS: int = 1  # Upload indexing workers (indexing itself is serialized by the processing lock)
+    MAX_UPLOAD_SIZE_MB: int = 200  # Uploads larger than this are rejected with 413, 0 = no limit
+    UPLOAD_QUEUE_SIZE: int = 32  # Uploads waiting to be indexed before new ones are rejected with 503
+    
+    # Vector store compaction
+    VERSION_RETENTION_COUNT: int = 1  # Versions per document whose stores are kept, latest first
+    VERSION_RETENTION_DAYS: int = 0  # Also keep versions processed within this many days, 0 = off
+    COMPACTION_ARCHIVE_PATH: str = ""  # Move expired stores here instead of deleting them
     
     # Embeddings
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./vector_store/embedding_cache.sqlite3"
+    QUERY_CACHE_SIZE: int = 1024  # Query vectors kept in memory, 0 = off
+    QUERY_CACHE_TTL_SECONDS: int = 3600  # Cached query vectors expire after this long, 0 = never
     
     # Groq Model - UPDATED to llama-3.1-8b-instant
     GROQ_MODEL: str = "llama-3.1-8b-instant"
@@ -88,10 +88,15 @@
 
 
 
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.database import connect_to_mongo, close_mongo_connection
-from app.routes import conversations, auth, query
+from app.routes import conversations, auth, query, documents
+from app.services.ingestion_service import ingestion_service
+from app.services.upload_service import upload_service
+from app.utils.embeddings import warmup_embeddings, embeddings_ready
 
 app = FastAPI(title="Document Chat API", version="1.0.0")
 
@@ -108,14 +113,21 @@ app.add_middleware(
 app.include_router(query.router)
 app.include_router(conversations.router)
 app.include_router(auth.router)
+app.include_router(documents.router)
 
 # Database events
 @app.on_event("startup")
 async def startup_event():
     await connect_to_mongo()
+    # Warm the shared embedding model before ingestion or queries use it
+    await asyncio.to_thread(warmup_embeddings)
+    await ingestion_service.start(query.document_service)
+    await upload_service.start(query.document_service)
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await upload_service.stop()
+    await ingestion_service.stop()
     await close_mongo_connection()
 
 @app.get("/")
@@ -124,4 +136,18 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "document-chat-api"}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "service": "document-chat-api",
+        "ready": embeddings_ready(),
+        "ingestion_running": ingestion_service.is_running,
+        "ingestion_error": ingestion_service.last_error,
+        "upload_workers_running": upload_service.is_running
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the embedding model is loaded and warm"""
+    if not embeddings_ready():
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
@@ -172,6 +172,9 @@ class QueryRequest(BaseModel):
     
     question: str
     document_ids: Optional[List[str]] = None
+    folder_paths: Optional[List[str]] = None  # Restrict the search to these folders (and their subfolders)
+    ef_search: Optional[int] = Field(default=None, ge=1, le=4096)  # HNSW search breadth (higher = better recall, slower)
+    nprobe: Optional[int] = Field(default=None, ge=1, le=4096)  # IVF-PQ lists scanned (higher = better recall, slower)
     new_chat: bool = False
 
 class QueryResponse(BaseModel):
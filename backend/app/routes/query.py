@@ -314,29 +314,26 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from datetime import datetime, timezone
-from app.services.rag_service import RAGService
+from app.services.rag_service import get_rag_service
 from app.services.conversation_service import ConversationService
-from app.services.document_service import DocumentService
+from app.services.document_service import get_document_service
+from app.services.ingestion_service import ingestion_service
 from app.routes.auth import get_current_user
 from app.models.conversation import QueryRequest, QueryResponse
 import time
+import asyncio
 
 router = APIRouter(prefix="/query", tags=["Query"])
-rag_service = RAGService()
+rag_service = get_rag_service()
 conversation_service = ConversationService()
-document_service = DocumentService()
+document_service = get_document_service()
 
 @router.post("/ask", response_model=QueryResponse)
 async def ask_question(query: QueryRequest, current_user: dict = Depends(get_current_user)):
-    print("📝 Checking /uploads for new files before answering...")
-    new_docs = await document_service.process_existing_documents()
-
-    if new_docs:
-        print(f"📦 New documents detected & processed: {new_docs}")
-    else:
-        print("✅ No new documents to process before query")
-
-    documents = await document_service.get_processed_documents()
+    # New uploads are indexed by the background ingestion worker, never on the query path
+    documents = ingestion_service.get_catalog()
+    if documents is None:
+        documents = await ingestion_service.refresh_catalog()
     print(f"📊 Total processed documents available: {len(documents)}")
 
     if not documents:
@@ -351,8 +348,28 @@ async def ask_question(query: QueryRequest, current_user: dict = Depends(get_cur
         else:
             raise HTTPException(status_code=404, detail="Requested documents not processed.")
 
+    # Scope the search to folders: explicit ones must match, inferred ones only narrow when they do.
+    # Only the index partitions holding the scoped documents are then searched.
+    if query.folder_paths:
+        documents = document_service.filter_documents_by_folders(documents, query.folder_paths)
+        if not documents:
+            raise HTTPException(status_code=404, detail="No processed documents in the requested folders.")
+        print(f"📁 Using requested folders: {query.folder_paths}")
+    else:
+        inferred_folders = document_service.find_relevant_folders(
+            query.question, folder_paths=list({d.get("folder_path", "") for d in documents})
+        )
+        scoped = document_service.filter_documents_by_folders(documents, inferred_folders) if inferred_folders else []
+        if scoped:
+            documents = scoped
+            print(f"📁 Inferred folders: {inferred_folders}")
+
     print(f"🤖 Running version-aware RAG query: '{query.question}'")
-    result = rag_service.query_documents_with_versions(query.question, documents, document_service)
+    # Embedding, search and generation block, keep them off the event loop
+    result = await asyncio.to_thread(
+        rag_service.query_documents_with_versions,
+        query.question, documents, document_service, ef_search=query.ef_search, nprobe=query.nprobe
+    )
 
     # ===== Conversation Management =====
     start_time = time.time()
@@ -446,6 +463,16 @@ async def debug_versions():
         }
     return {"count": len(docs), "versions": versions}
 
+@router.get("/debug/cache")
+async def debug_cache():
+    embedding_cache = rag_service.embeddings.cache
+    query_cache = rag_service.embeddings.query_cache
+    return {
+        "vector_store_cache": rag_service.store_cache.stats(),
+        "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+        "query_embedding_cache": query_cache.stats() if query_cache else None
+    }
+
 @router.get("/debug/document-content/{filename}")
 async def debug_document_content(filename: str):
     all_docs = document_service.get_available_documents()
@@ -0,0 +1,154 @@
+import os
+import re
+import time
+import shutil
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set
+from app.config import get_settings
+
+settings = get_settings()
+
+UUID_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files under a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class CompactionService:
+    """Reclaims the disk and index space held by superseded document versions.
+
+    - expired: versions outside the retention policy (latest N per document,
+      plus anything processed within the last N days)
+    - orphaned: UUID directories or global index entries with no metadata row
+    - imported: legacy per-document directories of retained versions whose
+      chunks already live in the global index
+    """
+
+    def __init__(self, rag_service, metadata_store, vector_store_dir: str = None):
+        self.rag_service = rag_service
+        self.metadata_store = metadata_store
+        self.vector_store_dir = vector_store_dir or settings.VECTOR_STORE_PATH
+
+    def find_expired_versions(self, keep_versions: int, retention_days: int) -> Dict[str, Set[str]]:
+        """Split the registry's vector_store_ids into retained and expired ones"""
+        cutoff = None
+        if retention_days > 0:
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).isoformat()
+
+        retained: Set[str] = set()
+        expired: Set[str] = set()
+        for versions in self.metadata_store.get_all_versions().values():
+            first_kept = len(versions) - max(keep_versions, 1)
+            for position, entry in enumerate(versions):
+                vs_id = entry["vector_store_id"]
+                recent = cutoff is not None and (entry.get("processed_at") or "") >= cutoff
+                if position >= first_kept or entry.get("is_latest") or recent:
+                    retained.add(vs_id)
+                else:
+                    expired.add(vs_id)
+        # A store shared by a retained version is never expired
+        return {"retained": retained, "expired": expired - retained}
+
+    def _remove_directory(self, path: str, archive_dir: Optional[str]):
+        if archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+            shutil.move(path, os.path.join(archive_dir, os.path.basename(path)))
+        else:
+            shutil.rmtree(path)
+
+    def _index_bytes(self) -> int:
+        return directory_size(self.rag_service.vector_index.index_dir)
+
+    def run(self, keep_versions: int = None, retention_days: int = None, archive_dir: str = None, dry_run: bool = False) -> Dict:
+        """Delete (or archive) expired and orphaned stores, returns a report with the bytes reclaimed"""
+        start = time.time()
+        keep_versions = settings.VERSION_RETENTION_COUNT if keep_versions is None else keep_versions
+        retention_days = settings.VERSION_RETENTION_DAYS if retention_days is None else retention_days
+        archive_dir = settings.COMPACTION_ARCHIVE_PATH if archive_dir is None else archive_dir
+
+        versions = self.find_expired_versions(keep_versions, retention_days)
+        retained, expired = versions["retained"], versions["expired"]
+        vector_index = self.rag_service.vector_index
+
+        # Imported legacy directories are only deleted once the index holding their chunks is on disk
+        if not dry_run:
+            vector_index.save()
+
+        report = {
+            "dry_run": dry_run,
+            "archive_dir": archive_dir or None,
+            "keep_versions": keep_versions,
+            "retention_days": retention_days,
+            "expired_directories": [],
+            "orphaned_directories": [],
+            "imported_directories": [],
+            "expired_index_stores": 0,
+            "orphaned_index_stores": 0,
+            "index_chunks_removed": 0,
+            "directory_bytes_reclaimed": 0,
+            "index_bytes_reclaimed": 0,
+        }
+
+        # Per-document legacy directories
+        if os.path.isdir(self.vector_store_dir):
+            for entry in os.scandir(self.vector_store_dir):
+                if not entry.is_dir() or not UUID_PATTERN.match(entry.name):
+                    continue
+                if entry.name in expired:
+                    kind = "expired_directories"
+                elif entry.name not in retained:
+                    kind = "orphaned_directories"
+                elif vector_index.has_store(entry.name):
+                    kind = "imported_directories"
+                else:
+                    continue
+
+                size = directory_size(entry.path)
+                if not dry_run:
+                    try:
+                        self._remove_directory(entry.path, archive_dir)
+                        self.rag_service.store_cache.invalidate(entry.name)
+                    except Exception as e:
+                        print(f"❌ Error removing vector store directory {entry.name}: {e}")
+                        continue
+                report[kind].append(entry.name)
+                report["directory_bytes_reclaimed"] += size
+
+        # Global index entries (superseded versions are normally dropped on ingestion already)
+        stale_stores = []
+        for vs_id in vector_index.store_ids():
+            if vs_id in expired:
+                report["expired_index_stores"] += 1
+            elif vs_id not in retained:
+                report["orphaned_index_stores"] += 1
+            else:
+                continue
+            stale_stores.append(vs_id)
+            report["index_chunks_removed"] += vector_index.store_chunk_count(vs_id)
+
+        if stale_stores and not dry_run:
+            index_bytes = self._index_bytes()
+            for vs_id in stale_stores:
+                self.rag_service.remove_vector_store(vs_id)
+            # Saves only append chunk and keyword files, rewrite them so the removed chunks leave the disk
+            vector_index.save(consolidate=True)
+            report["index_bytes_reclaimed"] = max(index_bytes - self._index_bytes(), 0)
+
+        report["bytes_reclaimed"] = report["directory_bytes_reclaimed"] + report["index_bytes_reclaimed"]
+        report["elapsed_seconds"] = round(time.time() - start, 3)
+
+        action = "Would reclaim" if dry_run else ("Archived" if archive_dir else "Reclaimed")
+        print(
+            f"🧹 {action} {report['bytes_reclaimed'] / 1024 / 1024:.1f} MB: "
+            f"{len(report['expired_directories'])} expired, {len(report['orphaned_directories'])} orphaned, "
+            f"{len(report['imported_directories'])} imported directories, "
+            f"{report['index_chunks_removed']} stale index chunks"
+        )
+        return report
@@ -1,45 +1,68 @@
 import os
-import shutil
+import re
+import uuid
+import asyncio
 import hashlib
-import json
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from typing import List, Tuple, Optional, Dict, Any
-from pathlib import Path
 from fastapi import UploadFile, HTTPException
-import PyPDF2
-import docx
 from datetime import datetime, timezone
-from app.services.rag_service import RAGService
+from app.services.rag_service import get_rag_service
+from app.services.ingestion_pipeline import IngestionPipeline
+from app.services.metadata_store import get_metadata_store
+from app.services.compaction_service import CompactionService
+from app.utils import extractors
+from app.utils.fingerprints import FingerprintJournal, HASH_ALGORITHM, HASH_DIGEST_SIZE, hash_file
 from app.config import get_settings
 
 settings = get_settings()
 
 class DocumentService:
+    # Shared by every instance so the background worker and API routes never index concurrently
+    _processing_lock = asyncio.Lock()
+    UPLOAD_BLOCK_SIZE = 4 * 1024 * 1024  # Upload bytes read, hashed and written per step
+    
     def __init__(self):
-        self.rag_service = RAGService()
+        self.rag_service = get_rag_service()
+        self.pipeline = IngestionPipeline(self.rag_service)
         self.upload_dir = "./uploads"
+        # Hidden, so the ingestion scan skips uploads until their job moves them into place
+        self.staging_dir = os.path.join(self.upload_dir, ".staging")
+        self._staged_hashes: Dict[str, str] = {}
         self.vector_store_dir = "./vector_store"
-        self.metadata_file = os.path.join(self.vector_store_dir, "document_metadata.json")
+        self.metadata_store = get_metadata_store()
+        self.fingerprints = FingerprintJournal(os.path.join(self.vector_store_dir, "file_fingerprints.json"))
+        self.compactor = CompactionService(self.rag_service, self.metadata_store, self.vector_store_dir)
         os.makedirs(self.upload_dir, exist_ok=True)
         os.makedirs(self.vector_store_dir, exist_ok=True)
     
-    def _load_metadata(self) -> Dict:
-        """Load document metadata from file"""
-        if os.path.exists(self.metadata_file):
+    @asynccontextmanager
+    async def index_writer(self):
+        """Hold the global index's cross-process writer lock for a whole load-modify-save pass.
+        
+        Every uvicorn worker and CLI command runs its own ingestion, so the
+        registry and index are only ever modified by the lock holder. The
+        lock belongs to the calling task: other tasks of this process wait
+        for it like other processes do, nested passes of the task re-enter it.
+        """
+        vector_index = self.rag_service.vector_index
+        if vector_index.holds_writer():
+            vector_index.acquire_writer()
+        else:
+            # Block in a thread, but claim the lock for this task: work it hands to asyncio.to_thread inherits it
+            acquiring = asyncio.ensure_future(asyncio.to_thread(vector_index.lock_writer))
             try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"❌ Error loading metadata: {e}")
-                return {}
-        return {}
-    
-    def _save_metadata(self, metadata: Dict):
-        """Save document metadata to file"""
+                token = await asyncio.shield(acquiring)
+            except asyncio.CancelledError:
+                # The thread still gets the lock eventually: give it back then, or every other writer waits forever
+                acquiring.add_done_callback(lambda done: done.exception() is None and vector_index.unlock_writer(done.result()))
+                raise
+            vector_index.claim_writer(token)
         try:
-            with open(self.metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, indent=2, default=str)
-        except Exception as e:
-            print(f"❌ Error saving metadata: {e}")
+            yield
+        finally:
+            vector_index.release_writer()
     
     def get_folder_structure(self, base_path: str = None) -> Dict:
         """Get complete folder structure recursively"""
@@ -114,86 +137,42 @@ class DocumentService:
     
     def extract_text_from_pdf_by_page(self, file_path: str) -> List[Dict]:
         """Extract text from PDF page by page"""
-        pages = []
-        try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
-                
-                for page_num in range(total_pages):
-                    page = pdf_reader.pages[page_num]
-                    text = page.extract_text()
-                    
-                    if text.strip():
-                        pages.append({
-                            "page_number": page_num + 1,
-                            "text": text,
-                            "char_count": len(text)
-                        })
-                
-                print(f"📄 Extracted {len(pages)} pages from PDF: {os.path.basename(file_path)}")
-        except Exception as e:
-            print(f"❌ Error extracting text from PDF {file_path}: {e}")
-        
-        return pages
+        return extractors.extract_text_from_pdf_by_page(file_path)
     
     def extract_text_from_docx_by_page(self, file_path: str) -> List[Dict]:
         """Extract text from DOCX by paragraphs (simulated pages)"""
-        pages = []
-        try:
-            doc = docx.Document(file_path)
-            
-            # Group paragraphs into approximate pages (every 500 words)
-            current_page = []
-            current_word_count = 0
-            page_num = 1
-            
-            for paragraph in doc.paragraphs:
-                text = paragraph.text.strip()
-                if not text:
-                    continue
-                
-                words = len(text.split())
-                current_page.append(text)
-                current_word_count += words
-                
-                # Create new page every ~500 words
-                if current_word_count >= 500:
-                    pages.append({
-                        "page_number": page_num,
-                        "text": "\n".join(current_page),
-                        "char_count": sum(len(p) for p in current_page)
-                    })
-                    page_num += 1
-                    current_page = []
-                    current_word_count = 0
-            
-            # Add remaining content as last page
-            if current_page:
-                pages.append({
-                    "page_number": page_num,
-                    "text": "\n".join(current_page),
-                    "char_count": sum(len(p) for p in current_page)
-                })
-            
-            print(f"📄 Extracted {len(pages)} sections from DOCX: {os.path.basename(file_path)}")
-        except Exception as e:
-            print(f"❌ Error extracting text from DOCX {file_path}: {e}")
-        
-        return pages
+        return extractors.extract_text_from_docx_by_page(file_path)
     
     def calculate_content_hash(self, file_path: str) -> str:
-        """Calculate MD5 hash of file content"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        """Calculate content hash, reusing the fingerprint journal when the file is unchanged"""
+        return self.fingerprints.get_content_hash(file_path)
     
-    def get_file_timestamps(self, file_path: str) -> Tuple[datetime, datetime]:
+    def find_matching_version(self, versions: List[Dict], file_metadata: Dict[str, Any]) -> Tuple[Optional[Dict], bool]:
+        """Find the stored version with the same content as the file, returns (version, upgraded)"""
+        for version in versions:
+            stored = version["file_metadata"]
+            if stored.get("hash_algorithm", "md5") == file_metadata["hash_algorithm"] and \
+                    stored["content_hash"] == file_metadata["content_hash"]:
+                return version, False
+        
+        # Versions indexed before the fingerprint journal carry an MD5 hash: compare once and upgrade in place
+        for version in versions:
+            stored = version["file_metadata"]
+            legacy_algorithm = stored.get("hash_algorithm", "md5")
+            if legacy_algorithm == file_metadata["hash_algorithm"]:
+                continue
+            if hash_file(file_metadata["file_path"], legacy_algorithm) == stored["content_hash"]:
+                stored["content_hash"] = file_metadata["content_hash"]
+                stored["hash_algorithm"] = file_metadata["hash_algorithm"]
+                return version, True
+        
+        return None, False
+    
+    def get_file_timestamps(self, file_path: str, stat: os.stat_result = None) -> Tuple[datetime, datetime]:
         """Get actual file creation and modification timestamps"""
         try:
-            stat = os.stat(file_path)
+            if stat is None:
+                stat = os.stat(file_path)
             modified_at = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
             created_at = datetime.fromtimestamp(stat.st_ctime, tz=timezone.utc)
             return created_at, modified_at
@@ -205,9 +184,10 @@ class DocumentService:
     def get_file_metadata(self, file_path: str, folder_path: str = "") -> Dict[str, Any]:
         """Extract comprehensive file metadata including folder info"""
         filename = os.path.basename(file_path)
-        file_size = os.path.getsize(file_path)
-        created_at, modified_at = self.get_file_timestamps(file_path)
-        content_hash = self.calculate_content_hash(file_path)
+        stat = os.stat(file_path)
+        file_size = stat.st_size
+        created_at, modified_at = self.get_file_timestamps(file_path, stat)
+        content_hash = self.fingerprints.get_content_hash(file_path, stat)
         
         return {
             "filename": filename,
@@ -216,187 +196,394 @@ class DocumentService:
             "file_created_at": created_at.isoformat(),
             "file_modified_at": modified_at.isoformat(),
             "content_hash": content_hash,
+            "hash_algorithm": HASH_ALGORITHM,
             "file_extension": filename.split('.')[-1].lower() if '.' in filename else '',
             "file_path": file_path,
         }
     
-    async def process_document_by_pages(self, file_path: str, folder_path: str = "") -> Tuple[str, int, Dict[str, Any]]:
-        """Process document page by page and create vector store"""
-        
-        file_metadata = self.get_file_metadata(file_path, folder_path)
-        file_extension = file_metadata["file_extension"]
-        
-        # Extract pages based on file type
-        pages = []
-        if file_extension == 'pdf':
-            pages = self.extract_text_from_pdf_by_page(file_path)
-        elif file_extension in ['docx', 'doc']:
-            pages = self.extract_text_from_docx_by_page(file_path)
-        elif file_extension == 'txt':
-            # For txt files, treat entire content as one page
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-                pages = [{"page_number": 1, "text": text, "char_count": len(text)}]
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
-        
-        if not pages:
-            raise ValueError("No text could be extracted from the document")
-        
-        # Create vector store with page-level metadata
-        vector_store_id, chunk_count = self.rag_service.create_vector_store_from_pages(
-            pages, 
-            file_metadata["filename"],
-            folder_path
-        )
-        
-        return vector_store_id, chunk_count, file_metadata
+    def extract_pages(self, file_path: str, file_extension: str) -> List[Dict]:
+        """Extract pages based on file type"""
+        return extractors.extract_pages(file_path, file_extension)
     
     async def process_existing_documents(self) -> List[Dict]:
         """Process all documents in all folders recursively"""
-        processed_docs = []
-        
+        async with self._processing_lock, self.index_writer():
+            return await self._process_existing_documents()
+    
+    async def _process_existing_documents(self) -> List[Dict]:
         # Get all documents recursively
-        all_documents = self.get_all_documents_recursive()
+        all_documents = await asyncio.to_thread(self.get_all_documents_recursive)
         print(f"🔍 Found {len(all_documents)} documents in folder structure")
         
-        for doc in all_documents:
+        jobs, processed_docs = await self.find_pending_jobs(all_documents)
+        processed_docs.extend(await self.index_jobs(jobs))
+        await self.save_index_state(all_documents)
+        
+        return processed_docs
+    
+    async def find_pending_jobs(self, documents: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Stage 0: find new or changed documents (a stat sweep when the fingerprint journal is warm).
+        
+        Returns (jobs for the ingestion pipeline, error entries).
+        """
+        jobs = []
+        errors = []
+        
+        for doc in documents:
             try:
-                file_metadata = self.get_file_metadata(doc["file_path"], doc["folder_path"])
-                metadata = self._load_metadata()
+                file_metadata = await asyncio.to_thread(self.get_file_metadata, doc["file_path"], doc["folder_path"])
                 
                 # Create unique key combining folder path and filename
                 document_key = os.path.join(doc["folder_path"], doc["filename"]) if doc["folder_path"] else doc["filename"]
                 
-                # Check if this version already exists
-                content_exists = False
-                if document_key in metadata:
-                    for version in metadata[document_key]:
-                        if version["file_metadata"]["content_hash"] == file_metadata["content_hash"]:
-                            content_exists = True
-                            print(f"ℹ️ Document unchanged: {document_key}")
-                            break
-                
-                if not content_exists:
-                    print(f"📄 Processing: {document_key}")
-                    vector_store_id, chunk_count, processed_metadata = await self.process_document_by_pages(
-                        doc["file_path"],
-                        doc["folder_path"]
-                    )
-                    
-                    # Update metadata
-                    if document_key not in metadata:
-                        metadata[document_key] = []
-                    
-                    version_entry = {
-                        "vector_store_id": vector_store_id,
-                        "file_metadata": file_metadata,
-                        "chunk_count": chunk_count,
-                        "processed_at": datetime.now(timezone.utc).isoformat(),
-                        "version": len(metadata[document_key]) + 1,
-                        "is_latest": True
-                    }
-                    
-                    # Mark previous versions as not latest
-                    for entry in metadata[document_key]:
-                        entry["is_latest"] = False
-                    
-                    metadata[document_key].append(version_entry)
-                    self._save_metadata(metadata)
-                    
-                    processed_docs.append({
-                        "filename": doc["filename"],
-                        "folder_path": doc["folder_path"],
-                        "file_path": doc["file_path"],
-                        "vector_store_id": vector_store_id,
-                        "chunk_count": chunk_count,
-                        "status": "processed"
-                    })
-                    print(f"✅ Processed: {document_key}")
-                
+                # Check if this version already exists (indexed lookup on document key)
+                matching_version, upgraded = self.find_matching_version(
+                    self.metadata_store.get_versions(document_key), file_metadata
+                )
+                if matching_version is not None:
+                    if upgraded:
+                        self.metadata_store.update_content_hash(
+                            document_key,
+                            matching_version["version"],
+                            file_metadata["content_hash"],
+                            file_metadata["hash_algorithm"]
+                        )
+                    # Versions indexed before the global index existed are copied into it once. A latest version
+                    # with nothing to import never reached the saved index (e.g. a crash between the registry
+                    # commit and the index save), so it is indexed again rather than left unsearchable
+                    if not matching_version["is_latest"] or await asyncio.to_thread(
+                        self.rag_service.import_legacy_store, matching_version["vector_store_id"]
+                    ):
+                        continue
+                    print(f"♻️ Latest version of {document_key} is missing from the global index, re-indexing")
+
+                print(f"📄 Processing: {document_key}")
+                jobs.append({
+                    "document_key": document_key,
+                    "filename": doc["filename"],
+                    "folder_path": doc["folder_path"],
+                    "file_path": doc["file_path"],
+                    "file_extension": file_metadata["file_extension"],
+                    "file_metadata": file_metadata
+                })
             except Exception as e:
                 print(f"❌ Error processing {doc['filename']}: {e}")
-                processed_docs.append({
+                errors.append({
                     "filename": doc["filename"],
                     "folder_path": doc.get("folder_path", ""),
+                    "file_path": doc.get("file_path"),
                     "error": str(e),
                     "status": "error"
                 })
         
+        return jobs, errors
+    
+    def find_shared_store(self, file_metadata: Dict) -> Optional[Dict]:
+        """A live vector store already built for the same content (e.g. a copy in another folder)"""
+        for store in self.metadata_store.find_stores_by_content(file_metadata["content_hash"], file_metadata["hash_algorithm"]):
+            if self.rag_service.vector_index.has_store(store["vector_store_id"]):
+                return store
+        return None
+    
+    async def index_jobs(self, jobs: List[Dict]) -> List[Dict]:
+        """Stages 1-3: parallel extraction, chunking and batched embedding, then record the new versions.
+        
+        Content is indexed once: a job whose content hash already has a store
+        (or is being indexed by another job of the batch) points to that store.
+        """
+        processed_docs = []
+        unique_jobs: Dict[str, Dict] = {}
+        duplicate_jobs = []
+        
+        for job in jobs:
+            content_hash = job["file_metadata"]["content_hash"]
+            shared_store = self.find_shared_store(job["file_metadata"])
+            if shared_store is not None:
+                processed_docs.append(self.record_version(job, shared_store["vector_store_id"], shared_store["chunk_count"]))
+                print(f"🔗 Same content already indexed, sharing its store: {job['document_key']}")
+            elif content_hash in unique_jobs:
+                duplicate_jobs.append(job)
+            else:
+                unique_jobs[content_hash] = job
+        
+        results_by_hash = {}
+        for result in await self.pipeline.run(list(unique_jobs.values())):
+            results_by_hash[result["job"]["file_metadata"]["content_hash"]] = result
+        
+        for job in list(unique_jobs.values()) + duplicate_jobs:
+            result = results_by_hash[job["file_metadata"]["content_hash"]]
+            
+            if "error" in result:
+                print(f"❌ Error processing {job['filename']}: {result['error']}")
+                processed_docs.append({
+                    "filename": job["filename"],
+                    "folder_path": job["folder_path"],
+                    "file_path": job["file_path"],
+                    "error": result["error"],
+                    "status": "error"
+                })
+                continue
+            
+            processed_docs.append(self.record_version(job, result["vector_store_id"], result["chunk_count"]))
+            print(f"✅ Processed: {job['document_key']}")
+        
         return processed_docs
     
+    def record_version(self, job: Dict, vector_store_id: str, chunk_count: int) -> Dict:
+        """Record an indexed job as the new latest version and drop the versions it supersedes"""
+        # Record the new latest version in one transaction
+        superseded_ids = self.metadata_store.add_version(job["document_key"], {
+            "vector_store_id": vector_store_id,
+            "file_metadata": job["file_metadata"],
+            "chunk_count": chunk_count,
+            "processed_at": datetime.now(timezone.utc).isoformat()
+        })
+        
+        # Drop the chunks of superseded versions from the global index, unless another path still shares them
+        for superseded_id in superseded_ids:
+            if superseded_id == vector_store_id or self.metadata_store.is_store_referenced(superseded_id):
+                continue
+            self.rag_service.remove_vector_store(superseded_id)
+        
+        return {
+            "filename": job["filename"],
+            "folder_path": job["folder_path"],
+            "file_path": job["file_path"],
+            "vector_store_id": vector_store_id,
+            "chunk_count": chunk_count,
+            "status": "processed"
+        }
+    
+    async def process_upload(self, file_path: str, folder_path: str = "", progress: Optional[Dict] = None,
+                             staged_path: Optional[str] = None) -> Dict:
+        """Index one uploaded file, updating progress["pages_extracted"] and progress["chunks_embedded"] as it goes.
+        
+        A staged upload is moved to file_path first, under the processing lock,
+        so the background scan can never index it ahead of its job.
+        """
+        if progress is None:
+            progress = {}
+        progress.update(pages_extracted=0, chunks_embedded=0)
+        
+        async with self._processing_lock, self.index_writer():
+            if staged_path is not None:
+                await asyncio.to_thread(self.claim_staged_upload, staged_path, file_path)
+            doc = {"filename": os.path.basename(file_path), "folder_path": folder_path, "file_path": file_path}
+            jobs, errors = await self.find_pending_jobs([doc])
+            if errors:
+                raise ValueError(errors[0]["error"])
+            if not jobs:
+                # Same content as the latest version (or already picked up by the background scan)
+                return dict(doc, status="unchanged")
+            job = jobs[0]
+            
+            shared_store = self.find_shared_store(job["file_metadata"])
+            if shared_store is not None:
+                entry = self.record_version(job, shared_store["vector_store_id"], shared_store["chunk_count"])
+                progress["chunks_embedded"] = shared_store["chunk_count"]
+                await self.save_index_state()
+                print(f"🔗 Upload has the same content as an indexed document, sharing its store: {job['document_key']}")
+                return entry
+            
+            def count_pages(pages):
+                for page in pages:
+                    progress["pages_extracted"] += 1
+                    yield page
+            
+            def on_batch(chunks_embedded: int):
+                progress["chunks_embedded"] = chunks_embedded
+            
+            pages = self.pipeline.iter_document_pages(file_path, job["file_extension"], job["file_metadata"]["content_hash"])
+            vector_store_id, chunk_count = await asyncio.to_thread(
+                self.rag_service.create_vector_store_from_pages,
+                count_pages(pages),
+                job["filename"],
+                folder_path,
+                on_batch
+            )
+            entry = self.record_version(job, vector_store_id, chunk_count)
+            await self.save_index_state()
+        
+        print(f"✅ Processed upload: {job['document_key']}")
+        return entry
+    
+    async def save_index_state(self, all_documents: Optional[List[Dict]] = None):
+        """Persist the global index and fingerprint journal"""
+        # Partitions that outgrew ANN_MIN_VECTORS (or collected too many tombstones) are rebuilt first
+        if settings.VECTOR_INDEX_TYPE.lower() != "flat":
+            await asyncio.to_thread(self.rag_service.vector_index.build)
+        await asyncio.to_thread(self.rag_service.vector_index.save)
+        
+        # Persist the fingerprints once per pass so the next scan is a stat-only sweep
+        if all_documents is not None:
+            self.fingerprints.prune(doc["file_path"] for doc in all_documents)
+        await asyncio.to_thread(self.fingerprints.save)
+    
+    async def build_vector_index(self, index_type: Optional[str] = None, retrain: bool = False) -> List[Dict]:
+        """Rebuild global index partitions into the configured ANN type (training IVF-PQ), then save"""
+        async with self._processing_lock, self.index_writer():
+            rebuilt = await asyncio.to_thread(self.rag_service.vector_index.build, index_type, retrain)
+            await asyncio.to_thread(self.rag_service.vector_index.save)
+            return rebuilt
+    
+    async def compact_vector_stores(self, dry_run: bool = False, **policy) -> Dict:
+        """Remove expired and orphaned vector stores, never while a processing pass is running"""
+        async with self._processing_lock, self.index_writer():
+            return await asyncio.to_thread(self.compactor.run, dry_run=dry_run, **policy)
+    
     async def get_processed_documents(self) -> List[Dict]:
         """Get all processed documents with folder information"""
-        metadata = self._load_metadata()
         processed_docs = []
         
-        for document_key, versions in metadata.items():
-            if versions:
-                latest_version = max(versions, key=lambda x: x["version"])
-                
-                processed_docs.append({
-                    "filename": latest_version["file_metadata"]["filename"],
-                    "folder_path": latest_version["file_metadata"].get("folder_path", ""),
-                    "full_key": document_key,
-                    "file_path": latest_version["file_metadata"]["file_path"],
-                    "vector_store_id": latest_version["vector_store_id"],
-                    "file_size": latest_version["file_metadata"]["file_size"],
-                    "chunk_count": latest_version["chunk_count"],
-                    "file_modified_at": latest_version["file_metadata"]["file_modified_at"],
-                    "version": latest_version["version"],
-                    "is_latest": latest_version["is_latest"],
-                    "total_versions": len(versions)
-                })
+        for latest_version in await asyncio.to_thread(self.metadata_store.get_latest_documents):
+            processed_docs.append({
+                "filename": latest_version["file_metadata"]["filename"],
+                "folder_path": latest_version["file_metadata"].get("folder_path", ""),
+                "full_key": latest_version["document_key"],
+                "file_path": latest_version["file_metadata"]["file_path"],
+                "vector_store_id": latest_version["vector_store_id"],
+                "file_size": latest_version["file_metadata"]["file_size"],
+                "chunk_count": latest_version["chunk_count"],
+                "file_modified_at": latest_version["file_metadata"]["file_modified_at"],
+                "version": latest_version["version"],
+                "is_latest": latest_version["is_latest"],
+                "total_versions": latest_version["total_versions"]
+            })
         
         return processed_docs
     
-    def find_relevant_folders(self, query: str, folder_structure: Dict = None) -> List[str]:
-        """Intelligently find relevant folders based on query"""
+    # Keywords to folder mapping (customize based on your needs)
+    FOLDER_KEYWORDS = {
+        "policy": ["policy", "policies", "hr", "human resources"],
+        "leave": ["leave", "vacation", "time-off", "pto"],
+        "finance": ["finance", "financial", "accounting", "payroll"],
+        "legal": ["legal", "contracts", "compliance"],
+        "tech": ["technical", "technology", "it", "engineering"]
+    }
+    
+    def find_relevant_folders(self, query: str, folder_structure: Dict = None, folder_paths: List[str] = None) -> List[str]:
+        """Intelligently find relevant folders based on query.
+        
+        Returns folder paths relative to the uploads root (the form documents use),
+        matched against folder_paths when given, else against the uploads tree.
+        An empty list means no specific folder, search everything.
+        """
+        def contains(text: str, kw: str) -> bool:
+            # Short keywords ("hr", "it", "pto") must be whole words, or "it" matches "with" and "audit"
+            if len(kw) <= 3:
+                return re.search(rf"\b{re.escape(kw)}\b", text) is not None
+            return kw in text
+        
+        query_lower = query.lower()
+        query_keywords = [keywords for keywords in self.FOLDER_KEYWORDS.values() if any(contains(query_lower, kw) for kw in keywords)]
+        if not query_keywords:
+            return []
+        
+        def matches(folder_name: str) -> bool:
+            folder_name = folder_name.lower()
+            return any(any(contains(folder_name, kw) for kw in keywords) for keywords in query_keywords)
+        
+        if folder_paths is not None:
+            return sorted({path for path in folder_paths if path and any(matches(part) for part in path.split(os.sep))})
+        
         if folder_structure is None:
             folder_structure = self.get_folder_structure()
         
         relevant_folders = []
-        query_lower = query.lower()
-        
-        # Keywords to folder mapping (customize based on your needs)
-        folder_keywords = {
-            "policy": ["policy", "policies", "hr", "human resources"],
-            "leave": ["leave", "vacation", "time-off", "pto"],
-            "finance": ["finance", "financial", "accounting", "payroll"],
-            "legal": ["legal", "contracts", "compliance"],
-            "tech": ["technical", "technology", "it", "engineering"]
-        }
         
         def search_folders(node, path=""):
-            if node["type"] == "folder":
-                folder_name = node["name"].lower()
-                current_path = os.path.join(path, node["name"]) if path else node["name"]
+            for child in node.get("children", []):
+                if child["type"] != "folder":
+                    continue
+                current_path = os.path.join(path, child["name"]) if path else child["name"]
                 
                 # Check if folder name matches query keywords
-                for keyword_type, keywords in folder_keywords.items():
-                    if any(kw in query_lower for kw in keywords):
-                        if any(kw in folder_name for kw in keywords):
-                            relevant_folders.append(current_path)
-                            break
+                if matches(child["name"]):
+                    relevant_folders.append(current_path)
                 
                 # Recursively search children
-                for child in node.get("children", []):
-                    search_folders(child, current_path)
+                search_folders(child, current_path)
         
         search_folders(folder_structure)
-        
-        # If no specific folders found, return empty list (search all)
-        return relevant_folders if relevant_folders else []
+        return relevant_folders
+    
+    @staticmethod
+    def filter_documents_by_folders(documents: List[Dict], folder_paths: List[str]) -> List[Dict]:
+        """Documents stored in one of the folders or below it"""
+        scopes = [os.path.normpath(path.strip("/")) for path in folder_paths if path and path.strip("/")]
+        return [
+            doc for doc in documents
+            if any(doc.get("folder_path", "") == scope or doc.get("folder_path", "").startswith(scope + os.sep) for scope in scopes)
+        ]
     
-    async def save_uploaded_file(self, file: UploadFile, folder_path: str = "") -> str:
-        """Save uploaded file to specific folder in uploads"""
-        target_dir = os.path.join(self.upload_dir, folder_path) if folder_path else self.upload_dir
+    async def save_uploaded_file(self, file: UploadFile, folder_path: str = "") -> Tuple[str, str]:
+        """Stream an upload to the staging directory in large blocks, hashing and size-checking it in the same pass.
+        
+        Returns (final path under uploads, staged path). The ingestion scan
+        never sees a staged file; process_upload (or discard_staged_upload)
+        takes it from there, and the hash is kept so the file is never read
+        back just to be hashed.
+        """
+        filename = os.path.basename(file.filename or "")
+        if not filename or filename.startswith('.'):
+            raise HTTPException(status_code=400, detail="Invalid filename")
+        
+        upload_root = os.path.abspath(self.upload_dir)
+        target_dir = os.path.abspath(os.path.join(upload_root, folder_path)) if folder_path else upload_root
+        if os.path.commonpath([target_dir, upload_root]) != upload_root:
+            raise HTTPException(status_code=400, detail="Invalid folder path")
         os.makedirs(target_dir, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+        
+        file_path = os.path.join(self.upload_dir, os.path.relpath(os.path.join(target_dir, filename), upload_root))
+        staged_path = os.path.join(self.staging_dir, f"{uuid.uuid4().hex}.{filename}")
+        tmp_path = f"{staged_path}.part"
+        max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+        hasher = hashlib.blake2b(digest_size=HASH_DIGEST_SIZE)
+        file_size = 0
         
-        file_path = os.path.join(target_dir, file.filename)
+        def write_block(out, block: bytes):
+            # hashlib and file writes both release the GIL on large buffers
+            hasher.update(block)
+            out.write(block)
         
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        out = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            while True:
+                block = await file.read(self.UPLOAD_BLOCK_SIZE)
+                if not block:
+                    break
+                file_size += len(block)
+                if max_bytes and file_size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File exceeds the {settings.MAX_UPLOAD_SIZE_MB} MB upload limit")
+                await asyncio.to_thread(write_block, out, block)
+            await asyncio.to_thread(out.close)
+            await asyncio.to_thread(os.replace, tmp_path, staged_path)
+        except BaseException:
+            out.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
         
-        print(f"✅ Saved file to: {file_path}")
-        return file_path
\ No newline at end of file
+        self._staged_hashes[staged_path] = hasher.hexdigest()
+        print(f"✅ Staged upload for: {file_path}")
+        return file_path, staged_path
+    
+    def claim_staged_upload(self, staged_path: str, file_path: str):
+        """Move a staged upload to its place under uploads and record its fingerprint"""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(staged_path, file_path)
+        content_hash = self._staged_hashes.pop(staged_path, None)
+        if content_hash is not None:
+            # The rename keeps size, mtime and inode, so the fingerprint matches the final path
+            self.fingerprints.record(file_path, os.stat(file_path), content_hash)
+    
+    def discard_staged_upload(self, staged_path: str):
+        self._staged_hashes.pop(staged_path, None)
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+
+@lru_cache()
+def get_document_service() -> DocumentService:
+    """Process-wide document service, so routes and background workers share one fingerprint journal"""
+    return DocumentService()
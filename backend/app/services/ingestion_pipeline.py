@@ -0,0 +1,172 @@
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple, Iterator
+from app.utils.extractors import iter_pages
+from app.utils.extraction_cache import ExtractionCache, extract_pages_cached
+from app.config import get_settings
+
+settings = get_settings()
+
+class IngestionPipeline:
+    """Staged ingestion: extraction in a process pool, then chunking, then embedding batched across documents"""
+
+    def __init__(self, rag_service, workers: int = None, batch_size: int = None):
+        self.rag_service = rag_service
+        self.workers = workers or settings.INGESTION_WORKERS or os.cpu_count() or 1
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.streaming_threshold = settings.STREAMING_INGEST_THRESHOLD_MB * 1024 * 1024
+        self.extraction_cache = ExtractionCache(settings.EXTRACTION_CACHE_PATH) if settings.EXTRACTION_CACHE_ENABLED else None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> Optional[ProcessPoolExecutor]:
+        """Lazy process pool (None means extraction runs in the default thread pool)"""
+        if self._executor is None and self.workers > 1:
+            # spawn, not fork: the parent already holds the embedding model and its threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def shutdown(self):
+        """Stop the extraction worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def iter_document_pages(self, file_path: str, file_extension: str, content_hash: Optional[str] = None) -> Iterator[Dict]:
+        """Stream pages from the extraction cache when possible, parsing the file only on a miss"""
+        if self.extraction_cache is None or not content_hash:
+            return iter_pages(file_path, file_extension)
+        return self.extraction_cache.iter_pages(file_path, file_extension, content_hash)
+
+    async def _extract(self, job: Dict) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            extract_pages_cached,
+            job["file_path"],
+            job["file_extension"],
+            job.get("file_metadata", {}).get("content_hash"),
+            self.extraction_cache.cache_dir if self.extraction_cache else None
+        )
+
+    def _embed_and_store(self, batch: List[Tuple[int, Dict, List[str], List[Dict]]]) -> Dict[int, Dict]:
+        """Embed the chunks of several documents in one call, then save one vector store per document"""
+        texts = [text for _, _, doc_texts, _ in batch for text in doc_texts]
+        vectors = self.rag_service.embeddings.embed_documents(texts)
+
+        results = {}
+        offset = 0
+        for index, job, doc_texts, metadatas in batch:
+            doc_vectors = vectors[offset:offset + len(doc_texts)]
+            offset += len(doc_texts)
+            try:
+                vector_store_id = self.rag_service.create_vector_store_from_embeddings(doc_texts, doc_vectors, metadatas)
+                results[index] = {"job": job, "vector_store_id": vector_store_id, "chunk_count": len(doc_texts)}
+            except Exception as e:
+                results[index] = {"job": job, "error": str(e)}
+
+        print(f"🧠 Embedded batch of {len(texts)} chunks from {len(batch)} document(s)")
+        return results
+
+    def _stream_document(self, job: Dict) -> Dict:
+        """Index one very large document page by page, in-process, with bounded memory"""
+        try:
+            pages = self.iter_document_pages(
+                job["file_path"], job["file_extension"], job.get("file_metadata", {}).get("content_hash")
+            )
+            vector_store_id, chunk_count = self.rag_service.create_vector_store_from_pages(
+                pages, job["filename"], job["folder_path"]
+            )
+            return {"job": job, "vector_store_id": vector_store_id, "chunk_count": chunk_count}
+        except Exception as e:
+            return {"job": job, "error": str(e)}
+
+    async def run(self, jobs: List[Dict]) -> List[Dict]:
+        """Process jobs ({file_path, file_extension, filename, folder_path}) and return one result per job, in order"""
+        if not jobs:
+            return []
+
+        start = time.time()
+        results: Dict[int, Dict] = {}
+
+        # Very large files bypass the pool (whose workers return whole page lists) and stream one at a time
+        pooled_jobs = []
+        for index, job in enumerate(jobs):
+            file_size = job.get("file_metadata", {}).get("file_size")
+            if file_size is None:
+                try:
+                    file_size = os.path.getsize(job["file_path"])
+                except OSError:
+                    file_size = 0
+            if file_size >= self.streaming_threshold:
+                print(f"🌊 Streaming large document: {job['filename']} ({file_size / 1024 / 1024:.1f} MB)")
+                results[index] = await asyncio.to_thread(self._stream_document, job)
+            else:
+                pooled_jobs.append((index, job))
+
+        pending: List[Tuple[int, Dict, List[str], List[Dict]]] = []
+        pending_chunks = 0
+
+        # Bound documents between extraction and the embedder so parsed pages never pile up ahead of it:
+        # a permit is taken before extracting and only given back once the result has been embedded (or dropped)
+        max_in_flight = self.workers * 2
+        in_flight = asyncio.Semaphore(max_in_flight)
+
+        async def extract(index: int, job: Dict):
+            await in_flight.acquire()
+            try:
+                return index, job, await self._extract(job), None
+            except Exception as e:
+                return index, job, None, e
+
+        async def embed_pending():
+            nonlocal pending, pending_chunks
+            batch = pending
+            pending = []
+            pending_chunks = 0
+            try:
+                results.update(await asyncio.to_thread(self._embed_and_store, batch))
+            finally:
+                for _ in batch:
+                    in_flight.release()
+
+        tasks = [asyncio.create_task(extract(i, job)) for i, job in pooled_jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, job, pages, error = await next_done
+                if error is None and not pages:
+                    error = ValueError("No text could be extracted from the document")
+                if error is not None:
+                    in_flight.release()
+                    results[index] = {"job": job, "error": str(error)}
+                    continue
+
+                texts, metadatas = await asyncio.to_thread(
+                    self.rag_service.build_page_chunks, pages, job["filename"], job["folder_path"]
+                )
+                if not texts:
+                    in_flight.release()
+                    results[index] = {"job": job, "error": "No valid content found in pages to create vector store"}
+                    continue
+
+                pending.append((index, job, texts, metadatas))
+                pending_chunks += len(texts)
+                # Every permit waiting on the embedder means no extraction can finish before a flush
+                if pending_chunks >= self.batch_size or len(pending) >= max_in_flight:
+                    await embed_pending()
+
+            if pending:
+                await embed_pending()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        elapsed = time.time() - start
+        print(f"⚡ Ingested {len(jobs)} document(s) with {self.workers} worker(s) in {elapsed:.1f}s")
+        return [results[i] for i in range(len(jobs))]
@@ -0,0 +1,122 @@
+import os
+import asyncio
+from typing import List, Dict, Optional, Tuple
+from app.config import get_settings
+
+settings = get_settings()
+
+class IngestionService:
+    """Long-lived background worker that keeps the document index in sync with ./uploads"""
+
+    def __init__(self, document_service=None):
+        self._document_service = document_service
+        self.poll_interval = settings.INGESTION_POLL_INTERVAL
+        self._catalog: Optional[List[Dict]] = None
+        self._tree_signature: Optional[Tuple] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.last_scan_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def document_service(self):
+        """Lazy loading of document service"""
+        if self._document_service is None:
+            from app.services.document_service import get_document_service
+            self._document_service = get_document_service()
+        return self._document_service
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def get_catalog(self) -> Optional[List[Dict]]:
+        """Get the in-memory catalog of processed documents (None until the first refresh)"""
+        return self._catalog
+
+    async def refresh_catalog(self) -> List[Dict]:
+        """Rebuild the in-memory catalog from processed document metadata"""
+        self._catalog = await self.document_service.get_processed_documents()
+        return self._catalog
+
+    def trigger(self):
+        """Ask the worker to rescan the uploads tree as soon as possible"""
+        self._tree_signature = None
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _compute_tree_signature(self) -> Tuple:
+        """Cheap stat-only snapshot of the uploads tree used to detect changes"""
+        entries = []
+        for root, dirs, files in os.walk(self.document_service.upload_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for file in files:
+                if file.startswith('.'):
+                    continue
+                file_path = os.path.join(root, file)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((file_path, stat.st_size, stat.st_mtime_ns))
+        entries.sort()
+        return tuple(entries)
+
+    async def scan_once(self) -> List[Dict]:
+        """Index new or changed files if the uploads tree changed since the last pass"""
+        signature = await asyncio.to_thread(self._compute_tree_signature)
+        if signature == self._tree_signature and self._catalog is not None:
+            return []
+
+        processed_docs = await self.document_service.process_existing_documents()
+        self._tree_signature = signature
+        await self.refresh_catalog()
+
+        if processed_docs:
+            print(f"📦 Background ingestion processed {len(processed_docs)} document(s)")
+        return processed_docs
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await self.scan_once()
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Background ingestion error: {e}")
+            self.last_scan_at = loop.time()
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def start(self, document_service=None):
+        """Start the background ingestion worker"""
+        if self.is_running:
+            return
+        if document_service is not None:
+            self._document_service = document_service
+        self._wakeup = asyncio.Event()
+        await self.refresh_catalog()
+        self._task = asyncio.create_task(self._run())
+        print(f"🚀 Background ingestion started (polling every {self.poll_interval}s)")
+
+    async def stop(self):
+        """Stop the background ingestion worker"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.document_service.pipeline.shutdown()
+        print("🛑 Background ingestion stopped")
+
+ingestion_service = IngestionService()
@@ -0,0 +1,337 @@
+import re
+from itertools import islice
+from typing import List, Dict, Optional, Iterable, Tuple, NamedTuple
+import numpy as np
+from app.config import get_settings
+
+settings = get_settings()
+
+# Words, keeping clause numbers and codes whole ("4.2.1", "27b", "carry-over")
+TOKEN_PATTERN = re.compile(r"\w+(?:[./-]\w+)*")
+COMPOUND_SEPARATORS = re.compile(r"[/-]")
+STOP_WORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it its my of on or our "
+    "that the their there this to was we what when where which who will with you your".split()
+)
+# Segments added since the merged query view was built, before it is rebuilt
+MAX_FRESH_SEGMENTS = 64
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms without stop words; hyphenated and slashed compounds also yield their parts"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.casefold()):
+        if token in STOP_WORDS:
+            continue
+        tokens.append(token)
+        if "-" in token or "/" in token:
+            tokens.extend(part for part in COMPOUND_SEPARATORS.split(token) if part and part not in STOP_WORDS)
+    return tokens
+
+class PostingsSegment(NamedTuple):
+    """Inverted index of one batch of chunks: postings of term_ids[i] are [offsets[i], offsets[i + 1])"""
+    term_ids: np.ndarray  # int64, sorted and unique
+    offsets: np.ndarray  # int64, len(term_ids) + 1
+    chunk_ids: np.ndarray  # int64
+    term_freqs: np.ndarray  # float32
+    chunk_lengths: np.ndarray  # float32, length in terms of the chunk of each posting
+
+class LexicalIndex:
+    """BM25 keyword index over the chunks of every document version, kept next to the vector index.
+
+    Each batch of chunks added to a version becomes a compact postings
+    segment (parallel numpy arrays); collection statistics (document
+    frequencies, average length) are global, so scores are comparable across
+    versions. Removing a version drops its segments.
+
+    Queries read one merged postings view of all segments plus the few
+    segments added since it was built, so a query costs a handful of array
+    slices rather than a loop over every version. The view is rebuilt lazily
+    once too many fresh segments or removed versions pile up.
+
+    Segments never change once built, so the index is persisted as a series
+    of files, each holding the terms and segments added since the previous
+    one (delta_state); collection statistics are recomputed on load.
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.document_frequency = np.zeros(1024, dtype=np.int64)
+        self.segments: Dict[str, List[PostingsSegment]] = {}
+        self.total_chunks = 0
+        self.total_length = 0
+        # Merged query view; store codes are never reused, so postings of removed versions just stop matching
+        self._store_codes: Dict[str, int] = {}
+        self._store_names: Dict[int, str] = {}
+        self._next_code = 0
+        self._merged: Optional[PostingsSegment] = None
+        self._merged_codes = np.zeros(0, dtype=np.int64)
+        self._dead_postings = 0
+        self._fresh: List[Tuple[str, PostingsSegment]] = []
+        # Persistence: terms and segments not written to a file yet
+        self._saved_terms = 0
+        self._unsaved: List[Tuple[str, PostingsSegment]] = []
+
+    def _term_ids(self, terms: Iterable[str]) -> List[int]:
+        ids = []
+        for term in terms:
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                term_id = self.vocabulary[term] = len(self.vocabulary)
+            ids.append(term_id)
+        self._grow_statistics()
+        return ids
+
+    def _grow_statistics(self):
+        if len(self.vocabulary) > len(self.document_frequency):
+            grown = np.zeros(max(len(self.vocabulary), 2 * len(self.document_frequency)), dtype=np.int64)
+            grown[:len(self.document_frequency)] = self.document_frequency
+            self.document_frequency = grown
+
+    def _apply_statistics(self, segment: PostingsSegment, sign: int):
+        postings_per_term = np.diff(segment.offsets)
+        np.add.at(self.document_frequency, segment.term_ids, sign * postings_per_term)
+        chunk_ids, first = np.unique(segment.chunk_ids, return_index=True)
+        self.total_chunks += sign * len(chunk_ids)
+        self.total_length += sign * int(segment.chunk_lengths[first].sum())
+
+    def _store_code(self, vector_store_id: str) -> int:
+        code = self._store_codes.get(vector_store_id)
+        if code is None:
+            code = self._store_codes[vector_store_id] = self._next_code
+            self._store_names[code] = vector_store_id
+            self._next_code += 1
+        return code
+
+    def add(self, vector_store_id: str, chunk_ids: Iterable[int], texts: Iterable[str]):
+        """Index a batch of chunks of one document version"""
+        postings: Dict[int, List[Tuple[int, int, int]]] = {}
+        for chunk_id, text in zip(chunk_ids, texts):
+            tokens = tokenize(text)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for term_id, count in zip(self._term_ids(counts), counts.values()):
+                postings.setdefault(term_id, []).append((chunk_id, count, len(tokens)))
+        if not postings:
+            return
+
+        term_ids = sorted(postings)
+        rows = [row for term_id in term_ids for row in postings[term_id]]
+        offsets = np.zeros(len(term_ids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term_id]) for term_id in term_ids])
+        columns = np.asarray(rows, dtype=np.int64).reshape(-1, 3)
+        segment = PostingsSegment(
+            term_ids=np.asarray(term_ids, dtype=np.int64),
+            offsets=offsets,
+            chunk_ids=columns[:, 0].copy(),
+            term_freqs=columns[:, 1].astype(np.float32),
+            chunk_lengths=columns[:, 2].astype(np.float32),
+        )
+        self._add_segment(vector_store_id, segment)
+        self._unsaved.append((vector_store_id, segment))
+
+    def _add_segment(self, vector_store_id: str, segment: PostingsSegment):
+        self.segments.setdefault(vector_store_id, []).append(segment)
+        self._apply_statistics(segment, 1)
+        self._store_code(vector_store_id)
+        self._fresh.append((vector_store_id, segment))
+
+    def remove(self, vector_store_id: str):
+        segments = self.segments.pop(vector_store_id, ())
+        for segment in segments:
+            self._apply_statistics(segment, -1)
+        code = self._store_codes.pop(vector_store_id, None)
+        if code is not None:
+            del self._store_names[code]
+        fresh = [segment for vs_id, segment in self._fresh if vs_id == vector_store_id]
+        self._fresh = [(vs_id, segment) for vs_id, segment in self._fresh if vs_id != vector_store_id]
+        self._unsaved = [(vs_id, segment) for vs_id, segment in self._unsaved if vs_id != vector_store_id]
+        self._dead_postings += sum(len(s.chunk_ids) for s in segments) - sum(len(s.chunk_ids) for s in fresh)
+
+    def has_store(self, vector_store_id: str) -> bool:
+        return vector_store_id in self.segments
+
+    def _merge(self):
+        """Rebuild the merged postings view from every live segment"""
+        self._store_codes = {vs_id: code for code, vs_id in enumerate(self.segments)}
+        self._store_names = dict(enumerate(self.segments))
+        self._next_code = len(self._store_codes)
+        parts = [
+            (np.repeat(segment.term_ids, np.diff(segment.offsets)), segment, self._store_codes[vs_id])
+            for vs_id, segments in self.segments.items()
+            for segment in segments
+        ]
+        terms = np.concatenate([p[0] for p in parts]) if parts else np.zeros(0, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")
+        term_ids, counts = np.unique(terms[order], return_counts=True)
+        offsets = np.zeros(len(term_ids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(counts)
+
+        def column(name: str, dtype) -> np.ndarray:
+            values = [getattr(p[1], name) for p in parts]
+            return np.concatenate(values)[order] if values else np.zeros(0, dtype=dtype)
+
+        self._merged = PostingsSegment(
+            term_ids=term_ids,
+            offsets=offsets,
+            chunk_ids=column("chunk_ids", np.int64),
+            term_freqs=column("term_freqs", np.float32),
+            chunk_lengths=column("chunk_lengths", np.float32),
+        )
+        self._merged_codes = (
+            np.concatenate([np.full(len(p[0]), p[2], dtype=np.int64) for p in parts])[order]
+            if parts else np.zeros(0, dtype=np.int64)
+        )
+        self._dead_postings = 0
+        self._fresh = []
+
+    def _query_view(self) -> Tuple[PostingsSegment, List[Tuple[str, PostingsSegment]]]:
+        merged_postings = len(self._merged.chunk_ids) if self._merged is not None else 0
+        if (self._merged is None or len(self._fresh) > MAX_FRESH_SEGMENTS
+                or self._dead_postings > merged_postings // 2):
+            self._merge()
+        return self._merged, self._fresh
+
+    def _matches(self, query: str, vector_store_ids: Optional[Iterable[str]]) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """(chunk ids, BM25 term contributions, store codes) of every posting a query term hits, or None"""
+        term_ids = np.asarray(sorted({self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}), dtype=np.int64)
+        if not len(term_ids) or not self.total_chunks:
+            return None
+
+        frequencies = self.document_frequency[term_ids]
+        idf = np.log1p((self.total_chunks - frequencies + 0.5) / (frequencies + 0.5))
+        k1 = settings.BM25_K1
+        b = settings.BM25_B
+        average_length = self.total_length / self.total_chunks
+
+        merged, fresh = self._query_view()
+        allowed = np.zeros(self._next_code + 1, dtype=bool)
+        if vector_store_ids is None:
+            scope = None
+            allowed[np.fromiter(self._store_codes.values(), dtype=np.int64, count=len(self._store_codes))] = True
+        else:
+            scope = set(vector_store_ids)
+            allowed[[self._store_codes[vs_id] for vs_id in scope if vs_id in self._store_codes]] = True
+
+        sources = [(merged, self._merged_codes)]
+        sources.extend(
+            (segment, np.full(len(segment.chunk_ids), self._store_codes[vs_id], dtype=np.int64))
+            for vs_id, segment in fresh if scope is None or vs_id in scope
+        )
+        matched_ids, matched_scores, matched_codes = [], [], []
+        for segment, codes in sources:
+            positions = np.searchsorted(segment.term_ids, term_ids)
+            for term_index, position in enumerate(positions.tolist()):
+                if position >= len(segment.term_ids) or segment.term_ids[position] != term_ids[term_index]:
+                    continue
+                start, end = segment.offsets[position], segment.offsets[position + 1]
+                keep = allowed[codes[start:end]]
+                tf = segment.term_freqs[start:end][keep]
+                norm = k1 * (1 - b + b * segment.chunk_lengths[start:end][keep] / average_length)
+                matched_ids.append(segment.chunk_ids[start:end][keep])
+                matched_scores.append(idf[term_index] * tf * (k1 + 1) / (tf + norm))
+                matched_codes.append(codes[start:end][keep])
+        if not matched_ids:
+            return None
+        return np.concatenate(matched_ids), np.concatenate(matched_scores), np.concatenate(matched_codes)
+
+    @staticmethod
+    def _sum_by_chunk(chunk_ids: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Unique chunk ids, their summed scores, and the index of each chunk's first posting"""
+        unique_ids, first, inverse = np.unique(chunk_ids, return_index=True, return_inverse=True)
+        return unique_ids, np.bincount(inverse, weights=scores, minlength=len(unique_ids)), first
+
+    def search(self, query: str, k: int = 24, vector_store_ids: Optional[Iterable[str]] = None) -> List[Tuple[float, int]]:
+        """Top-k (BM25 score, chunk id), best first, over the given document versions (default: all)"""
+        matches = self._matches(query, vector_store_ids)
+        if matches is None or k <= 0:
+            return []
+
+        chunk_ids, scores, _ = self._sum_by_chunk(matches[0], matches[1])
+        if not len(chunk_ids):
+            return []
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.lexsort((chunk_ids[top], -scores[top]))]
+        return [(float(scores[i]), int(chunk_ids[i])) for i in top]
+
+    def best_stores(self, query: str, limit: int, vector_store_ids: Optional[Iterable[str]] = None) -> List[str]:
+        """Document versions ranked by their best matching chunk, a cheap first-stage filter"""
+        matches = self._matches(query, vector_store_ids)
+        if matches is None or limit <= 0:
+            return []
+
+        chunk_ids, scores, first = self._sum_by_chunk(matches[0], matches[1])
+        chunk_codes = matches[2][first]
+        best = np.full(self._next_code + 1, -np.inf)
+        np.maximum.at(best, chunk_codes, scores)
+        codes = np.unique(chunk_codes)
+        codes = codes[np.lexsort((codes, -best[codes]))][:limit]
+        return [self._store_names[int(code)] for code in codes]
+
+    def segment_count(self) -> int:
+        return sum(len(segments) for segments in self.segments.values())
+
+    def delta_state(self) -> Dict:
+        """Terms and segments added since the last mark_saved(), the content of one segment file"""
+        return {
+            "first_term_id": self._saved_terms,
+            "terms": list(islice(self.vocabulary, self._saved_terms, None)),
+            "segments": [(vs_id, tuple(segment)) for vs_id, segment in self._unsaved],
+        }
+
+    def full_state(self) -> Dict:
+        """Every term and live segment, a segment file that replaces all earlier ones"""
+        return {
+            "first_term_id": 0,
+            "terms": list(self.vocabulary),
+            "segments": [(vs_id, tuple(segment)) for vs_id, segments in self.segments.items() for segment in segments],
+        }
+
+    def mark_saved(self):
+        self._saved_terms = len(self.vocabulary)
+        self._unsaved = []
+
+    def apply_files(self, states: Iterable[Dict], store_first_chunks: Dict[str, int]):
+        """Drop segments of removed versions, then load segment files written after the ones already loaded.
+
+        store_first_chunks maps each live version to its first chunk id.
+        Chunk ids are never reused and grow with every batch, so a segment
+        belongs to the live copy of its version iff its chunk ids are at
+        least that version's first one.
+        """
+        def is_live(vs_id: str, segment: PostingsSegment) -> bool:
+            first_chunk = store_first_chunks.get(vs_id)
+            return first_chunk is not None and int(segment.chunk_ids[0]) >= first_chunk
+
+        states = list(states)
+        first_term_id = len(self.vocabulary)
+        for state in states:
+            if state["first_term_id"] != first_term_id:
+                raise ValueError("Keyword index segment files do not follow each other")
+            first_term_id += len(state["terms"])
+
+        for vs_id in list(self.segments):
+            live = [segment for segment in self.segments[vs_id] if is_live(vs_id, segment)]
+            if len(live) < len(self.segments[vs_id]):
+                self.remove(vs_id)
+                for segment in live:
+                    self._add_segment(vs_id, segment)
+
+        for state in states:
+            for term in state["terms"]:
+                self.vocabulary[term] = len(self.vocabulary)
+            self._grow_statistics()
+            for vs_id, arrays in state["segments"]:
+                segment = PostingsSegment(*arrays)
+                if is_live(vs_id, segment):
+                    self._add_segment(vs_id, segment)
+        self.mark_saved()
+
+def reciprocal_rank_fusion(rankings: List[List], k: Optional[int] = None) -> Dict:
+    """Fuse ranked lists of keys: each key scores sum(1 / (k + rank)) over the lists it appears in"""
+    k = settings.RRF_K if k is None else k
+    fused: Dict = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return fused
@@ -0,0 +1,203 @@
+import os
+import json
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import List, Dict, Optional
+from app.config import get_settings
+
+settings = get_settings()
+
+VERSION_COLUMNS = "document_key, version, vector_store_id, content_hash, hash_algorithm, filename, folder_path, is_latest, chunk_count, processed_at, file_metadata"
+
+class MetadataStore:
+    """Document version registry in SQLite (WAL mode), replacing vector_store/document_metadata.json"""
+
+    def __init__(self, db_path: str, legacy_json_path: Optional[str] = None):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        if legacy_json_path:
+            self._migrate_json(legacy_json_path)
+
+    def _create_schema(self):
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS document_versions (
+                    document_key TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    vector_store_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    hash_algorithm TEXT NOT NULL DEFAULT 'md5',
+                    filename TEXT NOT NULL,
+                    folder_path TEXT NOT NULL DEFAULT '',
+                    is_latest INTEGER NOT NULL DEFAULT 0,
+                    chunk_count INTEGER NOT NULL DEFAULT 0,
+                    processed_at TEXT,
+                    file_metadata TEXT NOT NULL,
+                    PRIMARY KEY (document_key, version)
+                );
+                CREATE INDEX IF NOT EXISTS idx_versions_content_hash ON document_versions (content_hash);
+                CREATE INDEX IF NOT EXISTS idx_versions_latest ON document_versions (is_latest, document_key);
+                CREATE INDEX IF NOT EXISTS idx_versions_vector_store ON document_versions (vector_store_id);
+            """)
+
+    def _migrate_json(self, json_path: str):
+        """One-time import of the legacy JSON metadata file"""
+        if not os.path.exists(json_path):
+            return
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM document_versions LIMIT 1").fetchone():
+                return
+            try:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    legacy = json.load(f)
+            except Exception as e:
+                print(f"❌ Error loading legacy metadata for migration: {e}")
+                return
+
+            rows = [self._to_row(document_key, entry) for document_key, versions in legacy.items() for entry in versions]
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(f"INSERT INTO document_versions ({VERSION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        os.replace(json_path, f"{json_path}.migrated")
+        print(f"📦 Migrated {len(rows)} document versions from {json_path} to {self.db_path}")
+
+    @staticmethod
+    def _to_row(document_key: str, entry: Dict) -> tuple:
+        file_metadata = entry["file_metadata"]
+        return (
+            document_key,
+            entry["version"],
+            entry["vector_store_id"],
+            file_metadata["content_hash"],
+            file_metadata.get("hash_algorithm", "md5"),
+            file_metadata["filename"],
+            file_metadata.get("folder_path", ""),
+            1 if entry.get("is_latest") else 0,
+            entry.get("chunk_count", 0),
+            entry.get("processed_at"),
+            json.dumps(file_metadata, default=str, separators=(",", ":")),
+        )
+
+    @staticmethod
+    def _to_entry(row: sqlite3.Row) -> Dict:
+        file_metadata = json.loads(row["file_metadata"])
+        file_metadata["content_hash"] = row["content_hash"]
+        file_metadata["hash_algorithm"] = row["hash_algorithm"]
+        return {
+            "vector_store_id": row["vector_store_id"],
+            "file_metadata": file_metadata,
+            "chunk_count": row["chunk_count"],
+            "processed_at": row["processed_at"],
+            "version": row["version"],
+            "is_latest": bool(row["is_latest"]),
+        }
+
+    def get_versions(self, document_key: str) -> List[Dict]:
+        """All versions of one document, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {VERSION_COLUMNS} FROM document_versions WHERE document_key = ? ORDER BY version",
+                (document_key,)
+            ).fetchall()
+        return [self._to_entry(row) for row in rows]
+
+    def add_version(self, document_key: str, entry: Dict) -> List[str]:
+        """Atomically append a new latest version, returns the vector_store_ids it supersedes"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                superseded = [row[0] for row in self._conn.execute(
+                    "SELECT vector_store_id FROM document_versions WHERE document_key = ?", (document_key,)
+                )]
+                entry = dict(entry, version=len(superseded) + 1, is_latest=True)
+                self._conn.execute(
+                    "UPDATE document_versions SET is_latest = 0 WHERE document_key = ? AND is_latest = 1",
+                    (document_key,)
+                )
+                self._conn.execute(
+                    f"INSERT INTO document_versions ({VERSION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._to_row(document_key, entry)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return superseded
+
+    def update_content_hash(self, document_key: str, version: int, content_hash: str, hash_algorithm: str):
+        """Record an upgraded content hash for an existing version"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE document_versions SET content_hash = ?, hash_algorithm = ? WHERE document_key = ? AND version = ?",
+                (content_hash, hash_algorithm, document_key, version)
+            )
+
+    def find_stores_by_content(self, content_hash: str, hash_algorithm: str) -> List[Dict]:
+        """Vector stores already built for this content under any path, latest versions first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT vector_store_id, chunk_count FROM document_versions "
+                "WHERE content_hash = ? AND hash_algorithm = ? ORDER BY is_latest DESC, processed_at DESC",
+                (content_hash, hash_algorithm)
+            ).fetchall()
+        stores = {}
+        for row in rows:
+            stores.setdefault(row["vector_store_id"], {"vector_store_id": row["vector_store_id"], "chunk_count": row["chunk_count"]})
+        return list(stores.values())
+
+    def is_store_referenced(self, vector_store_id: str) -> bool:
+        """True if some document's latest version still points at this vector store"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM document_versions WHERE vector_store_id = ? AND is_latest = 1 LIMIT 1",
+                (vector_store_id,)
+            ).fetchone()
+        return row is not None
+
+    def get_latest_documents(self) -> List[Dict]:
+        """Latest version of every document with its version count (indexed on is_latest)"""
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT {', '.join('v.' + c.strip() for c in VERSION_COLUMNS.split(','))},
+                       (SELECT COUNT(*) FROM document_versions c WHERE c.document_key = v.document_key) AS total_versions
+                FROM document_versions v
+                WHERE v.is_latest = 1
+                ORDER BY v.document_key
+            """).fetchall()
+        latest = []
+        for row in rows:
+            entry = self._to_entry(row)
+            entry["document_key"] = row["document_key"]
+            entry["total_versions"] = row["total_versions"]
+            latest.append(entry)
+        return latest
+
+    def get_all_versions(self) -> Dict[str, List[Dict]]:
+        """Every version grouped by document key (same shape as the legacy JSON file)"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {VERSION_COLUMNS} FROM document_versions ORDER BY document_key, version"
+            ).fetchall()
+        metadata: Dict[str, List[Dict]] = {}
+        for row in rows:
+            metadata.setdefault(row["document_key"], []).append(self._to_entry(row))
+        return metadata
+
+@lru_cache()
+def get_metadata_store() -> MetadataStore:
+    """Process-wide document version registry"""
+    return MetadataStore(
+        os.path.join(settings.VECTOR_STORE_PATH, "document_metadata.sqlite3"),
+        legacy_json_path=os.path.join(settings.VECTOR_STORE_PATH, "document_metadata.json")
+    )
@@ -1,20 +1,29 @@
 import os
 import uuid
 import time
+import heapq
 import httpx
 import re
-from typing import List, Dict, Tuple, Optional
-from datetime import datetime
+from functools import lru_cache
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, Callable
 from langchain_community.vectorstores import FAISS
-from langchain.docstore.document import Document
-from app.utils.embeddings import get_embeddings, chunk_text
+from app.services.vector_index import get_vector_index
+from app.services.lexical_index import reciprocal_rank_fusion
+from app.utils.embeddings import get_embeddings, chunk_text, load_faiss_vector_store
+from app.utils.store_cache import get_store_cache
 from app.config import get_settings
 
 settings = get_settings()
 
 class RAGService:
+    SEARCH_CANDIDATES = 24  # Nearest chunks fetched from the global index per question
+    MAX_CHUNKS_PER_DOCUMENT = 4
+    CONTEXT_CHUNKS = 6
+
     def __init__(self):
         self.embeddings = get_embeddings()
+        self.vector_index = get_vector_index()
+        self.store_cache = get_store_cache()
         self.model_name = settings.GROQ_MODEL
 
         if settings.GROQ_API_KEY and settings.GROQ_API_KEY.strip():
@@ -32,19 +41,12 @@ class RAGService:
 
     def create_vector_store(self, text: str, document_name: str) -> Tuple[str, int]:
         chunks = chunk_text(text)
-        documents = [Document(page_content=chunk, metadata={"document_name": document_name, "chunk_id": i, "chunk_count": len(chunks)}) for i, chunk in enumerate(chunks)]
-        vector_store = FAISS.from_documents(documents, self.embeddings)
-        vector_store_id = str(uuid.uuid4())
-        store_path = os.path.join(settings.VECTOR_STORE_PATH, vector_store_id)
-        os.makedirs(settings.VECTOR_STORE_PATH, exist_ok=True)
-        vector_store.save_local(store_path)
+        metadatas = [{"document_name": document_name, "chunk_id": i, "chunk_count": len(chunks)} for i in range(len(chunks))]
+        vector_store_id = self.create_vector_store_from_embeddings(chunks, self.embeddings.embed_documents(chunks), metadatas)
         return vector_store_id, len(chunks)
 
-    def create_vector_store_from_pages(self, pages: List[Dict], document_name: str, folder_path: str = "") -> Tuple[str, int]:
-        """Create vector store from page-by-page extracted content"""
-        documents = []
-        total_chunks = 0
-        
+    def iter_page_chunks(self, pages: Iterable[Dict], document_name: str, folder_path: str = "") -> Iterator[Tuple[str, Dict]]:
+        """Lazily chunk page-by-page extracted content, yields (text, metadata)"""
         for page in pages:
             page_text = page["text"]
             if not page_text.strip():
@@ -55,7 +57,7 @@ class RAGService:
             
             for i, chunk in enumerate(page_chunks):
                 # Enhanced metadata with page and folder information
-                metadata = {
+                yield chunk, {
                     "document_name": document_name,
                     "folder_path": folder_path,
                     "page_number": page["page_number"],
@@ -64,38 +66,178 @@ class RAGService:
                     "char_count": page.get("char_count", 0),
                     "source_type": "page_chunk"
                 }
-                
-                documents.append(Document(page_content=chunk, metadata=metadata))
-                total_chunks += 1
+
+    def build_page_chunks(self, pages: Iterable[Dict], document_name: str, folder_path: str = "") -> Tuple[List[str], List[Dict]]:
+        """Chunk page-by-page extracted content, returns (texts, metadatas)"""
+        texts = []
+        metadatas = []
+        for text, metadata in self.iter_page_chunks(pages, document_name, folder_path):
+            texts.append(text)
+            metadatas.append(metadata)
+        return texts, metadatas
+
+    def create_vector_store_from_embeddings(self, texts: List[str], vectors: List[List[float]], metadatas: List[Dict]) -> str:
+        """Add already embedded chunks to the global index under a new vector store id"""
+        if len(vectors) != len(texts):
+            raise ValueError("Embedding failed for document chunks")
+        vector_store_id = str(uuid.uuid4())
+        self.vector_index.add_store(vector_store_id, texts, vectors, metadatas)
+        return vector_store_id
+
+    def create_vector_store_from_pages(self, pages: Iterable[Dict], document_name: str, folder_path: str = "",
+                                       on_batch: Optional[Callable[[int], None]] = None) -> Tuple[str, int]:
+        """Stream pages into the chunker and fixed-size embedding batches, adding each batch to the index.
+
+        Only one batch of chunks is held at a time, so peak memory does not
+        grow with document size. Pages may be a list or a generator.
+        on_batch is called with the number of chunks embedded so far.
+        """
+        vector_store_id = str(uuid.uuid4())
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        texts = []
+        metadatas = []
+        total_chunks = 0
+        page_count = 0
         
-        if not documents:
-            raise ValueError("No valid content found in pages to create vector store")
+        def flush():
+            vectors = self.embeddings.embed_documents(texts)
+            self.vector_index.append_chunks(vector_store_id, texts, vectors, metadatas)
+            if on_batch is not None:
+                on_batch(total_chunks + len(texts))
         
-        # Create vector store
-        vector_store = FAISS.from_documents(documents, self.embeddings)
-        vector_store_id = str(uuid.uuid4())
-        store_path = os.path.join(settings.VECTOR_STORE_PATH, vector_store_id)
-        os.makedirs(settings.VECTOR_STORE_PATH, exist_ok=True)
-        vector_store.save_local(store_path)
+        try:
+            for text, metadata in self.iter_page_chunks(pages, document_name, folder_path):
+                if metadata["chunk_id"] == 0:
+                    page_count += 1
+                texts.append(text)
+                metadatas.append(metadata)
+                if len(texts) >= batch_size:
+                    flush()
+                    total_chunks += len(texts)
+                    texts = []
+                    metadatas = []
+            if texts:
+                flush()
+                total_chunks += len(texts)
+        except Exception:
+            # Never leave a half-indexed document behind
+            self.vector_index.remove_store(vector_store_id)
+            raise
         
-        print(f"✅ Created vector store with {total_chunks} chunks from {len(pages)} pages for: {document_name}")
+        if not total_chunks:
+            raise ValueError("No valid content found in pages to create vector store")
+        
+        print(f"✅ Created vector store with {total_chunks} chunks from {page_count} pages for: {document_name}")
         return vector_store_id, total_chunks
 
+    @staticmethod
+    def _estimate_store_bytes(vector_store: FAISS) -> int:
+        """Approximate resident size of a loaded store: float32 vectors plus chunk text"""
+        index = vector_store.index
+        text_bytes = sum(len(doc.page_content) for doc in getattr(vector_store.docstore, "_dict", {}).values())
+        return index.ntotal * index.d * 4 + text_bytes
+
     def load_vector_store(self, vector_store_id: str) -> FAISS:
+        """Load a legacy per-document FAISS directory (created before the global index) through the LRU cache"""
         store_path = os.path.join(settings.VECTOR_STORE_PATH, vector_store_id)
-        try:
-            return FAISS.load_local(store_path, self.embeddings, allow_dangerous_deserialization=True)
-        except Exception:
-            return FAISS.load_local(store_path, self.embeddings)
+        return self.store_cache.get_or_load(
+            vector_store_id,
+            lambda: load_faiss_vector_store(store_path, self.embeddings),
+            self._estimate_store_bytes
+        )
+
+    def remove_vector_store(self, vector_store_id: str):
+        """Drop a superseded version from the global index and the store cache"""
+        self.vector_index.remove_store(vector_store_id)
+        self.store_cache.invalidate(vector_store_id)
+
+    def import_legacy_store(self, vector_store_id: str) -> bool:
+        """Copy a legacy per-document store into the global index, returns False if there is nothing to import"""
+        if self.vector_index.has_store(vector_store_id):
+            return True
+        if not os.path.isdir(os.path.join(settings.VECTOR_STORE_PATH, vector_store_id)):
+            return False
 
-    def search_related_content(self, vector_store_id: str, query: str, k: int = 5) -> List[Dict]:
         vector_store = self.load_vector_store(vector_store_id)
-        docs_with_scores = vector_store.similarity_search_with_score(query, k=k*2)
-        relevant = []
-        for doc, score in docs_with_scores:
-            relevant.append({"content": doc.page_content, "score": score, "metadata": doc.metadata})
-        relevant.sort(key=lambda x: x["score"])
-        return relevant[:k]
+        ntotal = vector_store.index.ntotal
+        vectors = vector_store.index.reconstruct_n(0, ntotal)
+        texts = []
+        metadatas = []
+        for position in range(ntotal):
+            doc = vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+            texts.append(doc.page_content)
+            metadatas.append(doc.metadata)
+
+        self.vector_index.add_store(vector_store_id, texts, vectors, metadatas)
+        # Once imported the legacy copy is never searched again
+        self.store_cache.invalidate(vector_store_id)
+        print(f"📦 Imported legacy vector store {vector_store_id} ({ntotal} chunks) into the global index")
+        return True
+
+    def search_related_content(self, vector_store_id: str, query: str, k: int = 5, query_vector=None) -> List[Dict]:
+        if query_vector is None:
+            query_vector = self.embeddings.embed_query_vector(query)
+        return self.search_by_vector(query_vector, [vector_store_id], k=k)
+
+    def search_by_vector(self, query_vector, vector_store_ids: List[str], k: int = 5,
+                         ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[Dict]:
+        """Search with a precomputed query embedding, never re-encoding the question"""
+        # Another uvicorn worker may have saved a newer generation of the shared index
+        self.vector_index.refresh()
+        indexed_ids = []
+        legacy_ids = []
+        for vs_id in vector_store_ids:
+            (indexed_ids if self.vector_index.has_store(vs_id) else legacy_ids).append(vs_id)
+        
+        results = []
+        if indexed_ids:
+            results = self.vector_index.search(query_vector, k=k, vector_store_ids=indexed_ids, ef_search=ef_search, nprobe=nprobe)
+        
+        # Versions not yet imported into the global index are served from their cached legacy store
+        for vs_id in legacy_ids:
+            if not os.path.isdir(os.path.join(settings.VECTOR_STORE_PATH, vs_id)):
+                continue
+            vector_store = self.load_vector_store(vs_id)
+            for doc, score in vector_store.similarity_search_with_score_by_vector([float(x) for x in query_vector], k=k):
+                results.append({"content": doc.page_content, "score": float(score), "metadata": doc.metadata, "vector_store_id": vs_id})
+        
+        if legacy_ids:
+            return heapq.nsmallest(k, results, key=lambda x: x["score"])
+        return results[:k]
+
+    def hybrid_search(self, query: str, query_vector, vector_store_ids: List[str], k: int = 24,
+                      ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[Dict]:
+        """Vector and BM25 candidates fused by reciprocal rank, best first.
+
+        "score" stays the vector distance (None for keyword-only hits), "fused_score" orders the list.
+        Chunks found only by keyword are decoded only if they make the fused top k.
+        """
+        vector_scope = vector_store_ids
+        prefilter = settings.HYBRID_PREFILTER_STORES
+        if prefilter and len(vector_store_ids) > prefilter:
+            # Large scopes: only the versions with the best keyword matches are vector-searched
+            vector_scope = self.vector_index.best_lexical_stores(query, prefilter, vector_store_ids) or vector_store_ids
+        
+        vector_hits = self.search_by_vector(query_vector, vector_scope, k=k, ef_search=ef_search, nprobe=nprobe)
+        keyword_hits = self.vector_index.search_lexical(query, k=k, vector_store_ids=vector_store_ids)
+        
+        # Legacy store hits have no chunk id in the global index
+        hits_by_key = {c.get("chunk_id", (c["vector_store_id"], c["content"])): c for c in vector_hits}
+        bm25_scores = {chunk_id: score for score, chunk_id in keyword_hits}
+        fused = reciprocal_rank_fusion([list(hits_by_key), [chunk_id for _, chunk_id in keyword_hits]])
+        
+        results = []
+        for key in heapq.nsmallest(k, fused, key=lambda key: -fused[key]):
+            c = hits_by_key.get(key)
+            if c is None:
+                c = self.vector_index.get_chunk(key)
+                if c is None:
+                    continue
+                c.update({"score": None, "chunk_id": key})
+            c["fused_score"] = fused[key]
+            c["bm25_score"] = bm25_scores.get(key)
+            results.append(c)
+        return results
 
     def extract_dates(self, text: str) -> List[str]:
         patterns = [
@@ -112,33 +254,66 @@ class RAGService:
                 seen.add(d); out.append(d)
         return out[:10]
 
-    def query_documents_with_versions(self, query: str, documents: List[Dict], document_service) -> Dict:
+    def query_documents_with_versions(self, query: str, documents: List[Dict], document_service, query_vector=None,
+                                      ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> Dict:
         start = time.time()
         relevant_chunks = []
-        
+        # Copies of the same content in several folders share one vector store
+        documents_by_store: Dict[str, List[Dict]] = {}
         for doc in documents:
-            vs_id = doc.get("vector_store_id")
-            if not vs_id:
+            if doc.get("vector_store_id"):
+                documents_by_store.setdefault(doc["vector_store_id"], []).append(doc)
+        
+        # The question is encoded exactly once per request, then only its vector is used
+        if query_vector is None:
+            query_vector = self.embeddings.embed_query_vector(query)
+        if settings.HYBRID_SEARCH_ENABLED:
+            # Exact terms ("Form 27B", clause numbers) are matched by BM25 and fused with the vector ranking
+            hits = self.hybrid_search(query, query_vector, list(documents_by_store), k=self.SEARCH_CANDIDATES, ef_search=ef_search, nprobe=nprobe)
+            rank_of = lambda c: -c["fused_score"]
+        else:
+            hits = self.search_by_vector(query_vector, list(documents_by_store), k=self.SEARCH_CANDIDATES, ef_search=ef_search, nprobe=nprobe)
+            rank_of = lambda c: c["score"]
+        
+        # Hits are ranked best first, ties broken by the modification date of the document.
+        # Winners are picked in that order, so only they get their source details attached.
+        latest_copy = {}
+        for vs_id in {c["vector_store_id"] for c in hits}:
+            latest_copy[vs_id] = max(documents_by_store[vs_id], key=lambda d: d.get("file_modified_at") or "")
+        ranked = sorted(
+            range(len(hits)),
+            key=lambda i: (rank_of(hits[i]), latest_copy[hits[i]["vector_store_id"]].get("file_modified_at") or "")
+        )
+        hits_per_document = {}
+        seen_contents = set()
+        for position in ranked:
+            c = hits[position]
+            vs_id = c["vector_store_id"]
+            # Identical chunks from copies indexed separately (before stores were shared) count once
+            if c["content"] in seen_contents:
+                continue
+            if hits_per_document.get(vs_id, 0) >= self.MAX_CHUNKS_PER_DOCUMENT:
                 continue
-            chunks = self.search_related_content(vs_id, query, k=4)
-            for c in chunks:
-                c.update({
-                    "filename": doc["filename"],
-                    "folder_path": doc.get("folder_path", ""),
-                    "version": doc.get("version", 1),
-                    "file_modified_at": doc.get("file_modified_at"),
-                })
-                relevant_chunks.append(c)
-
-        # Sort by score and recency
-        relevant_chunks.sort(key=lambda x: (x["score"], x.get("file_modified_at", "")), reverse=False)
+            seen_contents.add(c["content"])
+            hits_per_document[vs_id] = hits_per_document.get(vs_id, 0) + 1
+            doc = latest_copy[vs_id]
+            c.update({
+                "filename": doc["filename"],
+                "folder_path": doc.get("folder_path", ""),
+                "version": doc.get("version", 1),
+                "file_modified_at": doc.get("file_modified_at"),
+                "also_in": [copy.get("full_key") or copy["filename"] for copy in documents_by_store[vs_id] if copy is not doc],
+            })
+            relevant_chunks.append(c)
+            if len(relevant_chunks) >= self.CONTEXT_CHUNKS:
+                break
 
         # Build context with enhanced folder information
         context_text = ""
         all_dates = []
         sources_metadata = []
         
-        for c in relevant_chunks[:6]:
+        for c in relevant_chunks:
             text = c["content"]
             dates = self.extract_dates(text)
             all_dates.extend(dates)
@@ -149,7 +324,8 @@ class RAGService:
                 "folder_path": c.get('folder_path', ''),
                 "version": c['version'],
                 "modified": c.get('file_modified_at', 'N/A'),
-                "page_number": c.get('metadata', {}).get('page_number', 'N/A')
+                "page_number": c.get('metadata', {}).get('page_number', 'N/A'),
+                "also_in": c.get('also_in', [])
             })
             
             # Add context with folder information
@@ -172,6 +348,7 @@ class RAGService:
         
         sources_info = "\n".join([
             f"- {meta['filename']} (Folder: {meta['folder_path']}, Version: {meta['version']}, Page: {meta['page_number']})"
+            + (f" [also in: {', '.join(meta['also_in'])}]" if meta['also_in'] else "")
             for meta in unique_sources.values()
         ])
 
@@ -231,4 +408,9 @@ Format your response EXACTLY like this:
             "dates_found": all_dates,
             "response_time": round(end - start, 3),
             "model_used": self.model_name
-        }
\ No newline at end of file
+        }
+
+@lru_cache()
+def get_rag_service() -> RAGService:
+    """Process-wide RAG service sharing one embedding model"""
+    return RAGService()
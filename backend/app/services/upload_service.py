@@ -0,0 +1,148 @@
+import uuid
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Dict, Optional
+from app.services.ingestion_service import ingestion_service
+from app.config import get_settings
+
+settings = get_settings()
+
+class UploadQueueFull(Exception):
+    """Raised when the upload queue has no room for another job"""
+
+class UploadService:
+    """Bounded queue of uploaded files waiting to be indexed, drained by background workers.
+
+    Jobs live in memory: each entry reports its status and progress
+    (pages extracted, chunks embedded) until the document is queryable.
+    """
+
+    MAX_FINISHED_JOBS = 1000  # Finished jobs kept for status queries, oldest dropped first
+
+    def __init__(self, document_service=None, workers: int = None, queue_size: int = None):
+        self._document_service = document_service
+        self.workers = workers or settings.UPLOAD_WORKERS
+        self.queue_size = queue_size or settings.UPLOAD_QUEUE_SIZE
+        self.jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def document_service(self):
+        """Lazy loading of document service"""
+        if self._document_service is None:
+            from app.services.document_service import get_document_service
+            self._document_service = get_document_service()
+        return self._document_service
+
+    @property
+    def is_running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def is_full(self) -> bool:
+        return self._queue is None or self._queue.full()
+
+    def submit(self, file_path: str, filename: str, folder_path: str = "", uploaded_by: str = None,
+               staged_path: str = None) -> Dict:
+        """Queue an uploaded file for indexing, raises UploadQueueFull when the queue is at capacity.
+
+        A staged upload (see DocumentService.save_uploaded_file) is moved to
+        file_path when its job starts.
+        """
+        if self.is_full():
+            raise UploadQueueFull(f"Upload queue is full ({self.queue_size} pending)")
+
+        now = datetime.now(timezone.utc).isoformat()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "filename": filename,
+            "folder_path": folder_path,
+            "file_path": file_path,
+            "staged_path": staged_path,
+            "uploaded_by": uploaded_by,
+            "status": "queued",
+            "pages_extracted": 0,
+            "chunks_embedded": 0,
+            "chunk_count": None,
+            "vector_store_id": None,
+            "error": None,
+            "queued_at": now,
+            "started_at": None,
+            "finished_at": None,
+        }
+        self._queue.put_nowait(job["job_id"])
+        self.jobs[job["job_id"]] = job
+        self._prune_finished()
+        print(f"📥 Queued upload {filename} as job {job['job_id']}")
+        return dict(job)
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def _prune_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job["finished_at"] is not None]
+        for job_id in finished[:max(len(finished) - self.MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job_id]
+
+    async def _process(self, job: Dict):
+        job["status"] = "processing"
+        job["started_at"] = datetime.now(timezone.utc).isoformat()
+        try:
+            # process_upload updates pages_extracted / chunks_embedded on the job in place
+            result = await self.document_service.process_upload(
+                job["file_path"], job["folder_path"], progress=job, staged_path=job["staged_path"]
+            )
+            if result["status"] == "unchanged":
+                job["status"] = "unchanged"
+            else:
+                job["vector_store_id"] = result["vector_store_id"]
+                job["chunk_count"] = result["chunk_count"]
+                job["status"] = "completed"
+            # The document is only queryable once the query catalog includes it
+            await ingestion_service.refresh_catalog()
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            print(f"❌ Upload job {job['job_id']} failed: {e}")
+        finally:
+            job["finished_at"] = datetime.now(timezone.utc).isoformat()
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self.jobs.get(job_id)
+                if job is not None:
+                    await self._process(job)
+            finally:
+                self._queue.task_done()
+
+    async def start(self, document_service=None):
+        """Start the upload workers"""
+        if self.is_running:
+            return
+        if document_service is not None:
+            self._document_service = document_service
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"🚀 Upload workers started ({self.workers} worker(s), queue size {self.queue_size})")
+
+    async def stop(self):
+        """Stop the upload workers, queued jobs are abandoned"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        # Abandoned uploads that were not moved into the uploads tree yet leave no staged copy behind
+        for job in self.jobs.values():
+            if job["finished_at"] is None and job["staged_path"]:
+                self.document_service.discard_staged_upload(job["staged_path"])
+        print("🛑 Upload workers stopped")
+
+upload_service = UploadService()
@@ -0,0 +1,736 @@
+import os
+import math
+import uuid
+import fcntl
+import mmap
+import time
+import heapq
+import bisect
+import pickle
+import hashlib
+import threading
+from functools import lru_cache
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Optional, Iterable, Tuple
+import numpy as np
+import faiss
+from app.services.lexical_index import LexicalIndex
+from app.config import get_settings
+
+settings = get_settings()
+
+MANIFEST_FORMAT = 1
+# Chunk and keyword files appended by saves before one save rewrites them into a single file
+MAX_SEGMENT_FILES = 16
+# Flat codes are mapped straight from the file (older FAISS builds without IO_FLAG_MMAP_IFC read them into memory)
+MMAP_READ_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+def index_kind(index: faiss.Index) -> str:
+    """Which of INDEX_TYPES a partition index is"""
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    return "hnsw" if isinstance(inner, faiss.IndexHNSW) else "flat"
+
+def new_partition_index(kind: str, vectors: np.ndarray, ids: np.ndarray) -> faiss.Index:
+    """Build a partition of the given kind; IVF-PQ centroids and codebooks are trained on a sample of vectors"""
+    dimension = vectors.shape[1]
+    if kind == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dimension, settings.HNSW_M)
+        hnsw.hnsw.efConstruction = settings.HNSW_EF_CONSTRUCTION
+        hnsw.hnsw.efSearch = settings.HNSW_EF_SEARCH
+        index = faiss.IndexIDMap2(hnsw)
+    elif kind == "ivfpq":
+        sample_size = min(len(vectors), settings.IVF_TRAINING_SAMPLE)
+        sample = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+        # k-means wants ~39 training points per centroid
+        nlist = settings.IVF_NLIST or int(4 * math.sqrt(len(vectors)))
+        nlist = max(1, min(nlist, sample_size // 39))
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dimension), dimension, nlist, settings.IVF_PQ_M, 8)
+        index.train(sample)
+        index.nprobe = settings.IVF_NPROBE
+    else:
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+    index.add_with_ids(vectors, ids)
+    return index
+
+class VectorIndex:
+    """Consolidated FAISS index holding the chunks of every indexed document version, partitioned by folder_path.
+
+    Chunks get globally unique int64 ids and each id remembers the
+    vector_store_id of the document version it came from, so a version can be
+    removed in place when it is superseded. Every folder gets its own
+    IndexIDMap2, so a search scoped to some documents only scans the
+    partitions that hold them.
+
+    Saved partitions and chunk text are opened memory-mapped and read-only, so
+    every uvicorn worker on a node shares one page-cache copy. A partition is
+    copied into memory only when this process modifies it, and mapped again
+    once saved. Each save writes a new generation of files named by the
+    manifest, which other workers pick up through refresh().
+
+    Only one process at a time may modify the index: writers hold an flock
+    on writer.lock across their whole load-modify-save pass (see writer()),
+    so saves from different workers or CLI commands never interleave.
+
+    New partitions are exact (Flat). build() converts partitions of at least
+    ANN_MIN_VECTORS into the VECTOR_INDEX_TYPE approximate index. HNSW graphs
+    cannot drop vectors, so their deleted ids are kept as tombstones that are
+    masked at search time until the partition is rebuilt.
+
+    A BM25 LexicalIndex over the same chunk ids is maintained alongside and
+    saved with each generation.
+
+    Chunk text and keyword postings are saved incrementally: a save appends
+    one file of each holding what was added since the previous save, so its
+    cost follows the size of the change rather than of the corpus. Once
+    MAX_SEGMENT_FILES accumulate, or removed chunks make up most of them, the
+    next save rewrites the live content into one file.
+    """
+
+    def __init__(self, index_dir: str, use_mmap: Optional[bool] = None):
+        self.index_dir = index_dir
+        self.partitions_dir = os.path.join(index_dir, "partitions")
+        self.manifest_file = os.path.join(index_dir, "manifest.pkl")
+        self.writer_lock_file = os.path.join(index_dir, "writer.lock")
+        self.use_mmap = settings.VECTOR_INDEX_MMAP if use_mmap is None else use_mmap
+        self._lock = threading.RLock()
+        # Held by one writing context of this process at a time, the flock then excludes other processes
+        self._writer_mutex = threading.Lock()
+        self._writer_guard = threading.Lock()
+        self._writer_fd: Optional[int] = None
+        # Token of the pass holding the lock, and the one of the calling context (an asyncio task and the
+        # threads it hands work to with asyncio.to_thread share it, other tasks and threads do not)
+        self._writer_pass: Optional[object] = None
+        self._writer_owner: ContextVar[Optional[object]] = ContextVar(f"vector_index_writer_{id(self)}", default=None)
+        self._writer_depth = 0
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.partitions: Dict[str, faiss.Index] = {}
+        self.partition_files: Dict[str, str] = {}
+        self._mapped_partitions = set()
+        # Saved chunks, one (table, blob) per chunk file in id order: table rows are (chunk id, offset, length)
+        # into a blob of pickled (vector_store_id, content, metadata)
+        self.chunk_files: List[Tuple[str, str]] = []
+        self.chunk_segments: List[Tuple[np.ndarray, bytes]] = []
+        self._chunk_segment_starts: List[int] = []
+        self.pending_chunks: Dict[int, Tuple[str, str, Dict]] = {}
+        self.store_chunks: Dict[str, List[int]] = {}
+        self.store_partition: Dict[str, str] = {}
+        self.tombstones: Dict[str, set] = {}
+        self._tombstone_selectors: Dict[str, Tuple] = {}
+        self.lexical = LexicalIndex()
+        # None until the keyword index has been saved in segment files
+        self.lexical_files: Optional[List[str]] = None
+        self._lexical_file_segments = 0
+        self.next_id = 0
+        self.generation = 0
+        self._manifest_stamp = None
+        self._dirty = False
+        self._dirty_partitions = set()
+
+    @staticmethod
+    def partition_file_name(partition: str, stamp: str) -> str:
+        """Folder paths are not safe file names, partitions are stored under a hash of theirs"""
+        return f"{hashlib.blake2b(partition.encode('utf-8'), digest_size=8).hexdigest()}-{stamp}.faiss"
+
+    @staticmethod
+    def partition_of(metadata: Dict) -> str:
+        return metadata.get("folder_path") or ""
+
+    def _stat_manifest(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.manifest_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        try:
+            if not os.path.exists(self.manifest_file):
+                return
+            self._load_manifest()
+            mode = "memory-mapped" if self.use_mmap else "in memory"
+            print(f"✅ Loaded global vector index ({mode}): {self.ntotal} chunks, {len(self.store_chunks)} document versions, {len(self.partitions)} folder partitions")
+        except Exception as e:
+            print(f"❌ Error loading global vector index, starting empty: {e}")
+            self._reset()
+
+    def _load_manifest(self, attempts: int = 3):
+        # Another worker may save a new generation (and delete the old files) while this one is opening them
+        for attempt in range(attempts):
+            stamp = self._stat_manifest()
+            with open(self.manifest_file, 'rb') as f:
+                state = pickle.load(f)
+            try:
+                self._open_state(state, set(state["partitions"]))
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+                continue
+            self._manifest_stamp = stamp
+            return
+
+    def _read_partition(self, file_name: str, writable: bool = False) -> faiss.Index:
+        path = os.path.join(self.partitions_dir, file_name)
+        if self.use_mmap and not writable:
+            return faiss.read_index(path, MMAP_READ_FLAGS)
+        return faiss.read_index(path)
+
+    def _read_chunk_files(self, table_name: str, blob_name: str):
+        table = np.load(os.path.join(self.index_dir, table_name), mmap_mode='r' if self.use_mmap else None)
+        with open(os.path.join(self.index_dir, blob_name), 'rb') as f:
+            if not self.use_mmap:
+                return table, f.read()
+            if os.fstat(f.fileno()).st_size == 0:
+                return table, b""
+            # The mapping stays valid after the file is closed (and after a later save unlinks it)
+            return table, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _read_lexical_file(self, file_name: str) -> Dict:
+        with open(os.path.join(self.index_dir, file_name), 'rb') as f:
+            return pickle.load(f)
+
+    def _read_lexical(self, lexical_files: List[str]) -> Tuple[LexicalIndex, List[Dict]]:
+        """Keyword index to update for a manifest's segment files, and the file contents to apply to it.
+
+        Only files written after the ones already loaded are read, so picking
+        up another worker's save costs the size of what it added.
+        """
+        loaded = self.lexical_files
+        if loaded is not None and lexical_files[:len(loaded)] == loaded:
+            return self.lexical, [self._read_lexical_file(name) for name in lexical_files[len(loaded):]]
+        return LexicalIndex(), [self._read_lexical_file(name) for name in lexical_files]
+
+    def _open_state(self, state: Dict, open_partitions: set, lexical: Optional[LexicalIndex] = None):
+        """Adopt a saved manifest, (re)opening the named partitions and keeping the others as they are"""
+        partitions = {}
+        for partition, file_name in state["partitions"].items():
+            if partition in open_partitions or partition not in self.partitions:
+                partitions[partition] = self._read_partition(file_name)
+            else:
+                partitions[partition] = self.partitions[partition]
+        chunk_files = state["chunk_files"]
+        opened = dict(zip(self.chunk_files, self.chunk_segments))
+        chunk_segments = [opened.get(tuple(names)) or self._read_chunk_files(*names) for names in chunk_files]
+        lexical_states: List[Dict] = []
+        if lexical is None:
+            lexical, lexical_states = self._read_lexical(state["lexical_files"])
+
+        # Everything is read, nothing below can fail half way
+        if self.use_mmap:
+            self._mapped_partitions = {p for p in partitions if p in open_partitions or p in self._mapped_partitions}
+        self.partitions = partitions
+        self.partition_files = dict(state["partitions"])
+        self.chunk_files = [tuple(names) for names in chunk_files]
+        self.chunk_segments = chunk_segments
+        self.pending_chunks = {}
+        self.store_chunks = {vs_id: list(chunk_ids) for vs_id, (_, chunk_ids) in state["stores"].items()}
+        self.store_partition = {vs_id: partition for vs_id, (partition, _) in state["stores"].items()}
+        self.tombstones = {partition: set(ids) for partition, ids in state.get("tombstones", {}).items()}
+        self._tombstone_selectors = {}
+        self.next_id = state["next_id"]
+        self.generation = state["generation"]
+        self._chunk_segment_starts = [int(table[0, 0]) if table.shape[1] else self.next_id for table, _ in chunk_segments]
+        lexical.apply_files(lexical_states, {vs_id: chunk_ids[0] for vs_id, chunk_ids in self.store_chunks.items() if chunk_ids})
+        if lexical is not self.lexical:
+            self._lexical_file_segments = 0
+        self._lexical_file_segments += sum(len(file_state["segments"]) for file_state in lexical_states)
+        self.lexical = lexical
+        self.lexical_files = list(state["lexical_files"])
+
+    def refresh(self) -> bool:
+        """Pick up a generation saved by another worker process, returns True if the index was reloaded.
+
+        A process with unsaved changes of its own keeps its state (its next save wins).
+        """
+        with self._lock:
+            if self._dirty:
+                return False
+            stamp = self._stat_manifest()
+            if stamp is None or stamp == self._manifest_stamp:
+                return False
+            try:
+                self._load_manifest()
+            except Exception as e:
+                print(f"⚠️ Could not reload the global vector index, keeping the loaded one: {e}")
+                return False
+            print(f"🔄 Reloaded global vector index generation {self.generation}")
+            return True
+
+    def holds_writer(self) -> bool:
+        """Whether the calling context holds the writer lock"""
+        return self._writer_pass is not None and self._writer_owner.get() is self._writer_pass
+
+    def lock_writer(self) -> object:
+        """Block until no other context of this process or any other process writes, then adopt the latest generation.
+
+        Unsaved changes of this process are dropped if another process saved
+        a newer generation meanwhile: they were made without the lock and
+        would overwrite it. Returns the token claim_writer() binds to the
+        context that writes; most callers want acquire_writer() instead.
+        """
+        self._writer_mutex.acquire()
+        fd = None
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            fd = os.open(self.writer_lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self._adopt_saved_generation()
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            self._writer_mutex.release()
+            raise
+        self._writer_fd = fd
+        self._writer_pass = object()
+        return self._writer_pass
+
+    def claim_writer(self, token: object):
+        """Make the calling context the holder of a lock taken with lock_writer()"""
+        with self._writer_guard:
+            if token is not self._writer_pass or self._writer_depth:
+                raise RuntimeError("Global index writer lock was not taken with this token")
+            self._writer_owner.set(token)
+            self._writer_depth = 1
+
+    def unlock_writer(self, token: object):
+        """Give back a lock taken with lock_writer() that no context claimed"""
+        with self._writer_guard:
+            if token is self._writer_pass and not self._writer_depth:
+                self._unlock()
+
+    def _unlock(self):
+        self._writer_pass = None
+        # Closing the descriptor releases the flock
+        os.close(self._writer_fd)
+        self._writer_fd = None
+        self._writer_mutex.release()
+
+    def acquire_writer(self):
+        """Take the cross-process writer lock for the calling context, re-entrant within that context.
+
+        Other contexts of this process block like other processes do, so two
+        tasks never interleave load-modify-save passes.
+        """
+        if self.holds_writer():
+            with self._writer_guard:
+                self._writer_depth += 1
+            return
+        self.claim_writer(self.lock_writer())
+
+    def release_writer(self):
+        if not self.holds_writer():
+            raise RuntimeError("Global index writer lock is not held by this context")
+        with self._writer_guard:
+            self._writer_depth -= 1
+            if self._writer_depth == 0:
+                self._writer_owner.set(None)
+                self._unlock()
+
+    @contextmanager
+    def writer(self):
+        """Hold the writer lock around a load-modify-save pass"""
+        self.acquire_writer()
+        try:
+            yield self
+        finally:
+            self.release_writer()
+
+    def _adopt_saved_generation(self):
+        with self._lock:
+            stamp = self._stat_manifest()
+            if stamp is None or stamp == self._manifest_stamp:
+                return
+            if self._dirty:
+                print("⚠️ Global vector index was saved by another process, dropping this process's unsaved changes")
+                self._dirty = False
+                self._dirty_partitions = set()
+                # The keyword index holds the dropped changes too, read it again from its files
+                self.lexical_files = None
+            self._load_manifest()
+            print(f"🔄 Loaded global vector index generation {self.generation} for writing")
+
+    def live_count(self, partition: str) -> int:
+        """Vectors of a partition that are not tombstoned"""
+        return self.partitions[partition].ntotal - len(self.tombstones.get(partition, ()))
+
+    @property
+    def ntotal(self) -> int:
+        return sum(self.live_count(partition) for partition in self.partitions)
+
+    def has_store(self, vector_store_id: str) -> bool:
+        return vector_store_id in self.store_chunks
+
+    def store_ids(self) -> List[str]:
+        """Every document version with chunks in the index"""
+        with self._lock:
+            return list(self.store_chunks)
+
+    def store_chunk_count(self, vector_store_id: str) -> int:
+        return len(self.store_chunks.get(vector_store_id, ()))
+
+    def _raw_chunk(self, chunk_id: int) -> Optional[bytes]:
+        """Pickled record of a saved chunk, sliced from its blob without decoding it"""
+        # Each save appends ids above every saved one, so chunk files hold increasing id ranges
+        segment = bisect.bisect_right(self._chunk_segment_starts, chunk_id) - 1
+        if segment < 0:
+            return None
+        table, blob = self.chunk_segments[segment]
+        ids = table[0]
+        row = int(np.searchsorted(ids, chunk_id))
+        if row >= len(ids) or ids[row] != chunk_id:
+            return None
+        offset = int(table[1, row])
+        return blob[offset:offset + int(table[2, row])]
+
+    def get_chunk(self, chunk_id: int) -> Optional[Dict]:
+        with self._lock:
+            record = self.pending_chunks.get(chunk_id)
+            if record is None:
+                raw = self._raw_chunk(chunk_id)
+                if raw is None:
+                    return None
+                record = pickle.loads(raw)
+        vector_store_id, content, metadata = record
+        return {"vector_store_id": vector_store_id, "content": content, "metadata": metadata}
+
+    def _writable_partition(self, partition: str) -> faiss.Index:
+        """Mapped partitions are read-only: copy one into memory before modifying it"""
+        index = self.partitions[partition]
+        if partition in self._mapped_partitions:
+            index = self.partitions[partition] = self._read_partition(self.partition_files[partition], writable=True)
+            self._mapped_partitions.discard(partition)
+        return index
+
+    def add_store(self, vector_store_id: str, texts: List[str], vectors, metadatas: List[Dict]) -> int:
+        """Add (or replace) the chunks of one document version"""
+        with self._lock:
+            if self.has_store(vector_store_id):
+                self.remove_store(vector_store_id)
+            return self.append_chunks(vector_store_id, texts, vectors, metadatas)
+
+    def append_chunks(self, vector_store_id: str, texts: List[str], vectors, metadatas: List[Dict]) -> int:
+        """Append a batch of chunks to a document version, so large documents can be indexed incrementally"""
+        embeddings = np.asarray(vectors, dtype=np.float32)
+        if embeddings.ndim != 2 or len(embeddings) != len(texts):
+            raise ValueError("Embedding failed for document chunks")
+
+        with self._lock:
+            # All chunks of a version live in the partition of its folder
+            partition = self.store_partition.get(vector_store_id)
+            if partition is None:
+                partition = self.partition_of(metadatas[0]) if metadatas else ""
+            if partition in self.partitions:
+                index = self._writable_partition(partition)
+            else:
+                index = self.partitions[partition] = faiss.IndexIDMap2(faiss.IndexFlatL2(embeddings.shape[1]))
+
+            ids = np.arange(self.next_id, self.next_id + len(texts), dtype=np.int64)
+            index.add_with_ids(embeddings, ids)
+            self.next_id += len(texts)
+
+            for chunk_id, text, metadata in zip(ids.tolist(), texts, metadatas):
+                self.pending_chunks[chunk_id] = (vector_store_id, text, metadata)
+            self.lexical.add(vector_store_id, ids.tolist(), texts)
+            self.store_chunks.setdefault(vector_store_id, []).extend(ids.tolist())
+            self.store_partition[vector_store_id] = partition
+            self._dirty_partitions.add(partition)
+            self._dirty = True
+        return len(texts)
+
+    def remove_store(self, vector_store_id: str) -> int:
+        """Remove every chunk of a document version (e.g. when it has been superseded)"""
+        with self._lock:
+            ids = self.store_chunks.pop(vector_store_id, None)
+            partition = self.store_partition.pop(vector_store_id, None)
+            if not ids:
+                return 0
+            if index_kind(self.partitions[partition]) == "hnsw":
+                self.tombstones.setdefault(partition, set()).update(ids)
+                self._tombstone_selectors.pop(partition, None)
+            else:
+                self._writable_partition(partition).remove_ids(np.asarray(ids, dtype=np.int64))
+            if not self.live_count(partition):
+                del self.partitions[partition]
+                self.tombstones.pop(partition, None)
+                self._tombstone_selectors.pop(partition, None)
+            for chunk_id in ids:
+                self.pending_chunks.pop(chunk_id, None)
+            self.lexical.remove(vector_store_id)
+            self._dirty_partitions.add(partition)
+            self._dirty = True
+        return len(ids)
+
+    def partitions_for(self, vector_store_ids: Iterable[str]) -> Dict[str, List[int]]:
+        """Allowed chunk ids grouped by the partition that holds them"""
+        allowed: Dict[str, List[int]] = {}
+        for vs_id in set(vector_store_ids):
+            chunk_ids = self.store_chunks.get(vs_id)
+            if chunk_ids:
+                allowed.setdefault(self.store_partition[vs_id], []).extend(chunk_ids)
+        return allowed
+
+    def _tombstone_selector(self, partition: str):
+        """Selector excluding a partition's tombstones, cached until they change"""
+        if partition not in self._tombstone_selectors:
+            # The inner selector must outlive the IDSelectorNot wrapping it
+            masked = faiss.IDSelectorBatch(np.fromiter(self.tombstones[partition], dtype=np.int64))
+            self._tombstone_selectors[partition] = (faiss.IDSelectorNot(masked), masked)
+        return self._tombstone_selectors[partition][0]
+
+    def search_parameters(self, index: faiss.Index, selector, k: int,
+                          ef_search: Optional[int] = None, nprobe: Optional[int] = None):
+        """Search parameters for a partition: id filter plus the recall/latency knob of its index type"""
+        kind = index_kind(index)
+        if kind == "hnsw":
+            # HNSW cannot return more neighbours than its search breadth
+            return faiss.SearchParametersHNSW(efSearch=max(ef_search or settings.HNSW_EF_SEARCH, k), sel=selector)
+        if kind == "ivfpq":
+            return faiss.SearchParametersIVF(nprobe=nprobe or settings.IVF_NPROBE, sel=selector)
+        return faiss.SearchParameters(sel=selector) if selector is not None else None
+
+    def search_ids(self, query_vector, k: int = 6, vector_store_ids: Optional[Iterable[str]] = None,
+                   ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[Tuple[float, int]]:
+        """Global top-k (distance, chunk id) across the scanned partitions, nearest first.
+
+        Each partition returns its own sorted top-k; they are merged through a
+        heap bounded at k over raw tuples, so nothing is built per candidate.
+        ef_search (HNSW) and nprobe (IVF-PQ) trade recall for latency per call.
+        """
+        with self._lock:
+            if not self.ntotal or k <= 0:
+                return []
+
+            query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+            if vector_store_ids is None:
+                scopes = [(partition, None) for partition in self.partitions]
+            else:
+                scopes = list(self.partitions_for(vector_store_ids).items())
+
+            targets = []
+            for partition, allowed_ids in scopes:
+                index = self.partitions[partition]
+                candidates = self.live_count(partition)
+                batch = None
+                if allowed_ids is not None and len(allowed_ids) < candidates:
+                    # Allowed ids are live ones, so this also excludes tombstones
+                    selector = batch = faiss.IDSelectorBatch(np.asarray(allowed_ids, dtype=np.int64))
+                    candidates = len(allowed_ids)
+                elif self.tombstones.get(partition):
+                    selector = self._tombstone_selector(partition)
+                else:
+                    selector = None
+                targets.append((index, self.search_parameters(index, selector, k, ef_search, nprobe), candidates, batch))
+
+            # Max-heap of the best k so far as (-distance, -chunk id): heap[0] is the current worst
+            heap: List[Tuple[float, int]] = []
+            for index, params, candidates, _ in targets:
+                scores, ids = index.search(query, min(k, candidates), params=params)
+                for score, chunk_id in zip(scores[0].tolist(), ids[0].tolist()):
+                    if chunk_id < 0:
+                        break
+                    entry = (-score, -chunk_id)
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+                    elif entry[0] < heap[0][0]:
+                        # Partition results are sorted by distance, the rest of this one cannot make the top k.
+                        # Equal distances are not sorted by id, so a tie with the worst kept hit keeps scanning
+                        break
+            return [(-score, -chunk_id) for score, chunk_id in sorted(heap, reverse=True)]
+
+    def search(self, query_vector, k: int = 6, vector_store_ids: Optional[Iterable[str]] = None,
+               ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> List[Dict]:
+        """Vector search over the corpus; when restricted to some document versions only their partitions are scanned"""
+        with self._lock:
+            results = []
+            for score, chunk_id in self.search_ids(query_vector, k, vector_store_ids, ef_search, nprobe):
+                # Chunk records are only decoded for the winners
+                chunk = self.get_chunk(chunk_id)
+                if chunk is None:
+                    continue
+                chunk["score"] = score
+                chunk["chunk_id"] = chunk_id
+                results.append(chunk)
+            return results
+
+    def partition_ids(self, partition: str) -> np.ndarray:
+        """Live chunk ids of a partition"""
+        ids = [chunk_id for vs_id, p in self.store_partition.items() if p == partition for chunk_id in self.store_chunks[vs_id]]
+        return np.asarray(sorted(ids), dtype=np.int64)
+
+    def build(self, index_type: Optional[str] = None, retrain: bool = False) -> List[Dict]:
+        """Rebuild partitions whose index does not match the configured type, returns what was rebuilt.
+
+        Partitions of at least ANN_MIN_VECTORS get index_type (VECTOR_INDEX_TYPE
+        by default), smaller ones are flat. HNSW partitions whose tombstones pass
+        ANN_TOMBSTONE_RATIO are rebuilt without them; retrain=True also retrains
+        IVF-PQ partitions on a fresh sample of their current vectors.
+        """
+        index_type = (index_type or settings.VECTOR_INDEX_TYPE).lower()
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown vector index type: {index_type} (expected one of {', '.join(INDEX_TYPES)})")
+
+        rebuilt = []
+        with self._lock:
+            for partition in list(self.partitions):
+                index = self.partitions[partition]
+                kind = index_kind(index)
+                live = self.live_count(partition)
+                target = index_type if live >= settings.ANN_MIN_VECTORS else "flat"
+                stale = len(self.tombstones.get(partition, ())) > settings.ANN_TOMBSTONE_RATIO * index.ntotal
+                if kind == target and not stale and not (retrain and kind == "ivfpq"):
+                    continue
+
+                start = time.time()
+                ids = self.partition_ids(partition)
+                if kind == "ivfpq":
+                    # Only PQ codes are stored, vectors come back approximated. Chunk ids are not
+                    # sequential, so id -> list position needs a hashtable direct map (make_direct_map refuses them)
+                    index = self._writable_partition(partition)
+                    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+                vectors = index.reconstruct_batch(ids)
+                self.partitions[partition] = new_partition_index(target, vectors, ids)
+                self._mapped_partitions.discard(partition)
+                self.tombstones.pop(partition, None)
+                self._tombstone_selectors.pop(partition, None)
+                self._dirty_partitions.add(partition)
+                self._dirty = True
+                rebuilt.append({"partition": partition, "from": kind, "to": target, "vectors": len(ids), "seconds": round(time.time() - start, 2)})
+                print(f"🏗️ Rebuilt partition '{partition or '/'}' as {target} ({len(ids)} vectors, was {kind}) in {time.time() - start:.1f}s")
+        return rebuilt
+
+    def search_lexical(self, query: str, k: int = 24, vector_store_ids: Optional[Iterable[str]] = None) -> List[Tuple[float, int]]:
+        """BM25 top-k (score, chunk id) over the given document versions, best first"""
+        with self._lock:
+            return self.lexical.search(query, k, vector_store_ids)
+
+    def best_lexical_stores(self, query: str, limit: int, vector_store_ids: Optional[Iterable[str]] = None) -> List[str]:
+        with self._lock:
+            return self.lexical.best_stores(query, limit, vector_store_ids)
+
+    def _write_chunk_files(self, stamp: str, chunk_ids: List[int]) -> Tuple[str, str]:
+        """Write the given chunks to a new blob; saved records are copied as raw bytes"""
+        table_name = f"chunks-{stamp}.npy"
+        blob_name = f"chunks-{stamp}.bin"
+        lengths = []
+        # Exclusive create: a file another worker has mapped must never be truncated
+        with open(os.path.join(self.index_dir, blob_name), 'xb') as f:
+            for chunk_id in chunk_ids:
+                record = self.pending_chunks.get(chunk_id)
+                raw = self._raw_chunk(chunk_id) if record is None else pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+                f.write(raw)
+                lengths.append(len(raw))
+
+        table = np.zeros((3, len(chunk_ids)), dtype=np.int64)
+        table[0] = chunk_ids
+        table[2] = lengths
+        if lengths:
+            table[1, 1:] = np.cumsum(table[2, :-1])
+        with open(os.path.join(self.index_dir, table_name), 'xb') as f:
+            np.save(f, table)
+        return table_name, blob_name
+
+    def _remove_unreferenced_files(self, state: Dict):
+        """Delete files of earlier generations (workers that still map them keep a valid mapping)"""
+        partition_files = set(state["partitions"].values())
+        for name in os.listdir(self.partitions_dir):
+            if name.endswith((".faiss", ".tmp")) and name not in partition_files:
+                os.remove(os.path.join(self.partitions_dir, name))
+        generation_files = {name for names in state["chunk_files"] for name in names} | set(state["lexical_files"])
+        for name in os.listdir(self.index_dir):
+            if name.startswith(("chunks", "lexical")) and name not in generation_files:
+                os.remove(os.path.join(self.index_dir, name))
+
+    def _save_chunks(self, stamp: str, consolidate: bool) -> List[Tuple[str, str]]:
+        """Append a chunk file with the chunks added since the last save, or rewrite the live ones into one"""
+        saved_rows = sum(table.shape[1] for table, _ in self.chunk_segments)
+        live_rows = sum(len(ids) for ids in self.store_chunks.values())
+        incremental = len(self.chunk_files) < MAX_SEGMENT_FILES and saved_rows + len(self.pending_chunks) <= 2 * live_rows
+        if incremental and not consolidate:
+            if not self.pending_chunks:
+                return list(self.chunk_files)
+            return list(self.chunk_files) + [self._write_chunk_files(stamp, sorted(self.pending_chunks))]
+        chunk_ids = sorted(chunk_id for ids in self.store_chunks.values() for chunk_id in ids)
+        return [self._write_chunk_files(stamp, chunk_ids)] if chunk_ids else []
+
+    def _save_lexical(self, stamp: str, consolidate: bool) -> Tuple[List[str], int]:
+        """Append a keyword file with the segments added since the last save, or rewrite the live ones into one.
+
+        Returns the keyword files of the generation and the segments they hold.
+        """
+        live_segments = self.lexical.segment_count()
+        incremental = (
+            not consolidate
+            and self.lexical_files is not None
+            and len(self.lexical_files) < MAX_SEGMENT_FILES
+            and self._lexical_file_segments <= 2 * live_segments
+        )
+        file_state = self.lexical.delta_state() if incremental else self.lexical.full_state()
+        if incremental and not file_state["terms"] and not file_state["segments"]:
+            return list(self.lexical_files), self._lexical_file_segments
+
+        name = f"lexical-{stamp}.pkl"
+        with open(os.path.join(self.index_dir, name), 'xb') as f:
+            pickle.dump(file_state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if incremental:
+            return self.lexical_files + [name], self._lexical_file_segments + len(file_state["segments"])
+        return [name], len(file_state["segments"])
+
+    def save(self, consolidate: bool = False):
+        """Persist a new generation: changed partitions and the chunk blob first, then the manifest naming them.
+
+        consolidate=True rewrites the live chunks and keyword postings into
+        one file of each, so the space of removed versions is given back now
+        rather than when the appended files next reach their limits.
+        """
+        with self.writer(), self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.partitions_dir, exist_ok=True)
+            generation = self.generation + 1
+            # File names are never reused, even by a save that crashed half way
+            stamp = f"{generation}-{uuid.uuid4().hex[:8]}"
+
+            partition_files = {p: name for p, name in self.partition_files.items() if p in self.partitions}
+            for partition in self._dirty_partitions:
+                index = self.partitions.get(partition)
+                if index is None:
+                    continue
+                partition_files[partition] = self.partition_file_name(partition, stamp)
+                faiss.write_index(index, os.path.join(self.partitions_dir, partition_files[partition]))
+            chunk_files = self._save_chunks(stamp, consolidate)
+            lexical_files, lexical_file_segments = self._save_lexical(stamp, consolidate)
+
+            state = {
+                "format": MANIFEST_FORMAT,
+                "generation": generation,
+                "next_id": self.next_id,
+                "partitions": partition_files,
+                "chunk_files": chunk_files,
+                "lexical_files": lexical_files,
+                "stores": {vs_id: (self.store_partition[vs_id], ids) for vs_id, ids in self.store_chunks.items()},
+                "tombstones": {partition: sorted(ids) for partition, ids in self.tombstones.items() if ids},
+            }
+            with open(f"{self.manifest_file}.tmp", 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f"{self.manifest_file}.tmp", self.manifest_file)
+            self._remove_unreferenced_files(state)
+            self._lexical_file_segments = lexical_file_segments
+
+            # Reopen what was just written so this process also serves it from the shared mapping
+            self._open_state(state, self._dirty_partitions if self.use_mmap else set(), lexical=self.lexical)
+            self._manifest_stamp = self._stat_manifest()
+            self._dirty_partitions = set()
+            self._dirty = False
+
+@lru_cache()
+def get_vector_index() -> VectorIndex:
+    """Process-wide global vector index"""
+    return VectorIndex(os.path.join(settings.VECTOR_STORE_PATH, "global_index"))
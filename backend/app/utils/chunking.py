@@ -0,0 +1,85 @@
+from typing import List, Tuple
+
+# Same separator hierarchy as the RecursiveCharacterTextSplitter used before:
+# paragraph, line, sentence, word, then single characters
+SEPARATORS = ("\n\n", "\n", ". ", "! ", "? ", " ", "")
+
+def _piece_lengths(text: str, separator: str) -> List[int]:
+    """Lengths of the pieces of text split on separator, each piece starting with its separator"""
+    if not separator:
+        return [1] * len(text)
+    parts = text.split(separator)
+    lengths = [len(parts[0])] if parts[0] else []
+    separator_length = len(separator)
+    lengths.extend(separator_length + len(part) for part in parts[1:])
+    return lengths
+
+def _merge(text: str, start: int, lengths: List[int], chunk_size: int, chunk_overlap: int, chunks: List[str]):
+    """Greedily pack consecutive pieces into chunks of at most chunk_size, carrying up to chunk_overlap characters over.
+
+    The pieces are contiguous in text, so a chunk is one slice of it: no joins.
+    """
+    offsets = [start]
+    for length in lengths:
+        offsets.append(offsets[-1] + length)
+
+    first = 0
+    total = 0
+    for i, length in enumerate(lengths):
+        if total + length > chunk_size and first < i:
+            chunk = text[offsets[first]:offsets[i]].strip()
+            if chunk:
+                chunks.append(chunk)
+            while total > chunk_overlap or (total + length > chunk_size and total > 0):
+                total -= lengths[first]
+                first += 1
+        total += length
+
+    chunk = text[offsets[first]:offsets[-1]].strip()
+    if chunk:
+        chunks.append(chunk)
+
+def _split(text: str, separators: Tuple[str, ...], chunk_size: int, chunk_overlap: int, chunks: List[str]):
+    # Coarsest separator present in the text, finer ones are only used for oversized pieces
+    separator = separators[-1]
+    finer: Tuple[str, ...] = ()
+    for i, candidate in enumerate(separators):
+        if not candidate:
+            separator = candidate
+            break
+        if candidate in text:
+            separator = candidate
+            finer = separators[i + 1:]
+            break
+
+    position = 0
+    fitting: List[int] = []
+    fitting_start = 0
+    for length in _piece_lengths(text, separator):
+        if length < chunk_size:
+            if not fitting:
+                fitting_start = position
+            fitting.append(length)
+        else:
+            if fitting:
+                _merge(text, fitting_start, fitting, chunk_size, chunk_overlap, chunks)
+                fitting = []
+            piece = text[position:position + length]
+            if finer:
+                _split(piece, finer, chunk_size, chunk_overlap, chunks)
+            else:
+                chunks.append(piece)
+        position += length
+    if fitting:
+        _merge(text, fitting_start, fitting, chunk_size, chunk_overlap, chunks)
+
+def split_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """Recursive character splitting with the same boundaries as RecursiveCharacterTextSplitter, without per-call setup"""
+    chunks: List[str] = []
+    _split(text, SEPARATORS, chunk_size, chunk_overlap, chunks)
+    return chunks
+
+def clean_chunks(chunks: List[str], min_length: int = 50) -> List[str]:
+    """Drop very short chunks and normalize whitespace"""
+    # str.split() and re's \s share the same notion of whitespace, so this equals re.sub(r'\s+', ' ', ...) but is faster
+    return [' '.join(chunk.split()) for chunk in chunks if len(chunk.strip()) > min_length]
@@ -88,54 +88,130 @@
 
 
 from sentence_transformers import SentenceTransformer
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_core.embeddings import Embeddings
 from langchain.schema import Document
-from typing import List
+from typing import List, Optional
 import numpy as np
 import re
+import time
+import threading
 from app.config import get_settings
+from app.utils.embedding_cache import EmbeddingCache, QueryEmbeddingCache, text_hash
+from app.utils.chunking import split_text, clean_chunks
 import os
 
 settings = get_settings()
 
 class CustomEmbeddings(Embeddings):
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, cache: Optional[EmbeddingCache] = None,
+                 query_cache: Optional[QueryEmbeddingCache] = None):
         try:
             self.model = SentenceTransformer(model_name)
             print(f"✅ Loaded embedding model: {model_name}")
         except Exception as e:
             print(f"❌ Failed to load embedding model: {e}")
             raise
+        self.cache = cache
+        self.query_cache = query_cache
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         try:
             if not texts:
                 return []
-            embeddings = self.model.encode(texts, normalize_embeddings=True)
-            return embeddings.tolist()
+            if self.cache is None:
+                return self.model.encode(texts, normalize_embeddings=True).tolist()
+            return self._embed_documents_cached(texts).tolist()
         except Exception as e:
             print(f"❌ Error embedding documents: {e}")
             return []
     
+    def _embed_documents_cached(self, texts: List[str]) -> np.ndarray:
+        """Only encode chunks whose (text hash, model) is not already in the embedding cache"""
+        hashes = [text_hash(text) for text in texts]
+        try:
+            vectors = self.cache.get_many(hashes)
+        except Exception as e:
+            print(f"⚠️ Embedding cache lookup failed: {e}")
+            vectors = {}
+        
+        missing_texts = {}
+        for key, text in zip(hashes, texts):
+            if key not in vectors:
+                missing_texts.setdefault(key, text)
+        
+        if missing_texts:
+            new_hashes = list(missing_texts)
+            encoded = np.asarray(
+                self.model.encode(list(missing_texts.values()), normalize_embeddings=True), dtype=np.float32
+            )
+            vectors.update(zip(new_hashes, encoded))
+            try:
+                self.cache.put_many(new_hashes, encoded)
+            except Exception as e:
+                print(f"⚠️ Embedding cache write failed: {e}")
+        
+        print(f"🧠 Embedded {len(texts)} chunks ({len(texts) - len(missing_texts)} from cache, {len(missing_texts)} encoded)")
+        return np.stack([vectors[key] for key in hashes])
+    
     def embed_query(self, text: str) -> List[float]:
+        return self.embed_query_vector(text).tolist()
+    
+    def embed_query_vector(self, text: str) -> np.ndarray:
+        """Embed a query once as a float32 vector that can be reused across searches (read-only when cached)"""
         try:
             if not text:
-                return [0.0] * 384  # Default dimension for all-MiniLM-L6-v2
-            embedding = self.model.encode([text], normalize_embeddings=True)[0]
-            return embedding.tolist()
+                return np.zeros(384, dtype=np.float32)  # Default dimension for all-MiniLM-L6-v2
+            if self.query_cache is not None:
+                vector = self.query_cache.get(text)
+                if vector is not None:
+                    return vector
+            vector = self.model.encode([text], normalize_embeddings=True)[0].astype(np.float32)
+            if self.query_cache is not None:
+                self.query_cache.put(text, vector)
+            return vector
         except Exception as e:
             print(f"❌ Error embedding query: {e}")
-            return [0.0] * 384
+            return np.zeros(384, dtype=np.float32)
+
+# One embedding model per process, shared by every service
+_embeddings = None
+_embeddings_lock = threading.Lock()
+_embeddings_ready = threading.Event()
 
 def get_embeddings():
-    """Get embeddings instance with error handling"""
-    try:
-        return CustomEmbeddings(settings.EMBEDDING_MODEL)
-    except Exception as e:
-        print(f"❌ Critical: Failed to initialize embeddings: {e}")
-        raise
+    """Get the process-wide embeddings instance, loading the model on first use"""
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                try:
+                    cache = None
+                    if settings.EMBEDDING_CACHE_ENABLED:
+                        cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_MODEL)
+                    query_cache = None
+                    if settings.QUERY_CACHE_SIZE > 0:
+                        query_cache = QueryEmbeddingCache(
+                            settings.EMBEDDING_MODEL, settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL_SECONDS
+                        )
+                    _embeddings = CustomEmbeddings(settings.EMBEDDING_MODEL, cache, query_cache)
+                except Exception as e:
+                    print(f"❌ Critical: Failed to initialize embeddings: {e}")
+                    raise
+    return _embeddings
+
+def warmup_embeddings():
+    """Load the model and run a first encode so the first real request does not pay for it"""
+    embeddings = get_embeddings()
+    start = time.time()
+    embeddings.embed_documents(["Warmup sentence for the embedding model."])
+    embeddings.embed_query_vector("warmup")
+    _embeddings_ready.set()
+    print(f"🔥 Embedding model warmed up in {time.time() - start:.2f}s")
+
+def embeddings_ready() -> bool:
+    """True once the shared model is loaded and warm"""
+    return _embeddings_ready.is_set()
 
 def load_faiss_vector_store(store_path: str, embeddings):
     """Load FAISS vector store with version compatibility"""
@@ -168,24 +244,11 @@ def chunk_text(text: str) -> List[str]:
         return []
     
     try:
-        # Use more conservative chunking for policy documents
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,  # Smaller chunks for better precision
-            chunk_overlap=100,  # More overlap to preserve context
-            length_function=len,
-            separators=["\n\n", "\n", ". ", "! ", "? ", " ", ""]
-        )
+        # Single-pass splitter with precompiled patterns, same boundaries as RecursiveCharacterTextSplitter
+        chunks = split_text(text, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
         
-        chunks = text_splitter.split_text(text)
-        
-        # Filter and clean chunks
-        cleaned_chunks = []
-        for chunk in chunks:
-            chunk = chunk.strip()
-            if chunk and len(chunk) > 50:  # Remove very short chunks
-                # Further clean the chunk
-                chunk = re.sub(r'\s+', ' ', chunk)  # Normalize whitespace
-                cleaned_chunks.append(chunk)
+        # Filter very short chunks and normalize whitespace
+        cleaned_chunks = clean_chunks(chunks)
         
         print(f"📄 Created {len(cleaned_chunks)} cleaned chunks from text (length: {len(text)})")
         return cleaned_chunks
@@ -200,7 +263,7 @@ def chunk_text(text: str) -> List[str]:
             paragraph = paragraph.strip()
             if paragraph and len(paragraph) > 100:
                 # If paragraph is too long, split by sentences
-                if len(paragraph) > 800:
+                if len(paragraph) > settings.CHUNK_SIZE:
                     sentences = re.split(r'[.!?]+', paragraph)
                     current_chunk = ""
                     for sentence in sentences:
@@ -256,11 +319,14 @@ def create_faiss_index(documents: List[Document], embeddings, index_path: str):
         print(f"❌ Error creating FAISS index: {e}")
         raise
 
-def semantic_search(query: str, vector_store, k: int = 5, score_threshold: float = 0.7):
-    """Perform semantic search with score filtering"""
+def semantic_search(query: str, vector_store, k: int = 5, score_threshold: float = 0.7, query_vector=None):
+    """Perform semantic search with score filtering (pass query_vector to reuse an existing embedding)"""
     try:
+        if query_vector is None:
+            query_vector = vector_store.embeddings.embed_query(query)
+        
         # Get documents with similarity scores
-        docs_with_scores = vector_store.similarity_search_with_score(query, k=k*2)
+        docs_with_scores = vector_store.similarity_search_with_score_by_vector(list(query_vector), k=k*2)
         
         # Filter by score threshold
         filtered_docs = []
@@ -0,0 +1,74 @@
+import os
+import gzip
+import json
+import uuid
+from typing import List, Dict, Iterator, Iterable, Optional
+from app.utils.extractors import EXTRACTOR_VERSION, iter_pages
+
+class ExtractionCache:
+    """Per-page extracted text cached as gzip JSONL, keyed by file content hash and extractor version.
+
+    Chunking and embedding settings are not part of the key, so re-chunking
+    experiments and index rebuilds never have to parse PDF/DOCX files again.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _path(self, content_hash: str, file_extension: str) -> str:
+        version = EXTRACTOR_VERSION.get(file_extension, "1")
+        return os.path.join(self.cache_dir, content_hash[:2], f"{content_hash}.{file_extension}.v{version}.jsonl.gz")
+
+    def has(self, content_hash: str, file_extension: str) -> bool:
+        return os.path.exists(self._path(content_hash, file_extension))
+
+    def iter_cached(self, content_hash: str, file_extension: str) -> Optional[Iterator[Dict]]:
+        """Stream cached pages, or None on a miss"""
+        path = self._path(content_hash, file_extension)
+        if not os.path.exists(path):
+            return None
+
+        def read():
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+        return read()
+
+    def write_through(self, content_hash: str, file_extension: str, pages: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield pages while writing them to the cache, committed only if the extraction ran to the end.
+
+        An extractor error propagates to the consumer and leaves nothing in
+        the cache, so a failed parse is retried next time.
+        """
+        path = self._path(content_hash, file_extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        page_count = 0
+        completed = False
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=3) as f:
+                for page in pages:
+                    f.write(json.dumps(page, ensure_ascii=False, separators=(",", ":")))
+                    f.write("\n")
+                    page_count += 1
+                    yield page
+            completed = True
+        finally:
+            # Empty extractions are usually failures, do not pin them in the cache
+            if completed and page_count:
+                os.replace(tmp_path, path)
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def iter_pages(self, file_path: str, file_extension: str, content_hash: str) -> Iterator[Dict]:
+        """Stream pages from the cache, extracting (and caching) them on a miss"""
+        cached = self.iter_cached(content_hash, file_extension)
+        if cached is not None:
+            return cached
+        return self.write_through(content_hash, file_extension, iter_pages(file_path, file_extension))
+
+def extract_pages_cached(file_path: str, file_extension: str, content_hash: str, cache_dir: Optional[str]) -> List[Dict]:
+    """Picklable entry point for extraction worker processes"""
+    if not cache_dir or not content_hash:
+        return list(iter_pages(file_path, file_extension))
+    return list(ExtractionCache(cache_dir).iter_pages(file_path, file_extension, content_hash))
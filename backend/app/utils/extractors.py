@@ -0,0 +1,205 @@
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import List, Dict, Iterator
+import PyPDF2
+import docx
+
+# Module-level functions so extraction can run in worker processes without loading the embedding model
+
+WORDS_PER_DOCX_PAGE = 500
+
+# Bump an entry whenever that extractor's output changes, to invalidate cached pages
+EXTRACTOR_VERSION = {"pdf": "1", "docx": "2", "doc": "2", "txt": "1"}
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY = WORD_NAMESPACE + "body"
+W_P = WORD_NAMESPACE + "p"
+W_R = WORD_NAMESPACE + "r"
+W_HYPERLINK = WORD_NAMESPACE + "hyperlink"
+W_T = WORD_NAMESPACE + "t"
+W_TYPE = WORD_NAMESPACE + "type"
+# Run children that contribute text, as python-docx renders them (w:br depends on its type)
+RUN_TEXT = {
+    WORD_NAMESPACE + "tab": "\t",
+    WORD_NAMESPACE + "ptab": "\t",
+    WORD_NAMESPACE + "cr": "\n",
+    WORD_NAMESPACE + "noBreakHyphen": "-",
+}
+W_BR = WORD_NAMESPACE + "br"
+
+def iter_pdf_pages(file_path: str) -> Iterator[Dict]:
+    """Yield text from PDF one page at a time"""
+    page_count = 0
+    try:
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            total_pages = len(pdf_reader.pages)
+
+            for page_num in range(total_pages):
+                page = pdf_reader.pages[page_num]
+                text = page.extract_text()
+
+                if text.strip():
+                    page_count += 1
+                    yield {
+                        "page_number": page_num + 1,
+                        "text": text,
+                        "char_count": len(text)
+                    }
+
+            print(f"📄 Extracted {page_count} pages from PDF: {os.path.basename(file_path)}")
+    except Exception as e:
+        # Re-raised so a partial extraction is never taken (or cached) as the whole document
+        print(f"❌ Error extracting text from PDF {file_path}: {e}")
+        raise
+
+def iter_paragraph_pages(paragraphs) -> Iterator[Dict]:
+    """Group paragraph texts into approximate pages (every 500 words)"""
+    current_page = []
+    current_word_count = 0
+    page_num = 1
+
+    for text in paragraphs:
+        text = text.strip()
+        if not text:
+            continue
+
+        words = len(text.split())
+        current_page.append(text)
+        current_word_count += words
+
+        # Create new page every ~500 words
+        if current_word_count >= WORDS_PER_DOCX_PAGE:
+            yield {
+                "page_number": page_num,
+                "text": "\n".join(current_page),
+                "char_count": sum(len(p) for p in current_page)
+            }
+            page_num += 1
+            current_page = []
+            current_word_count = 0
+
+    # Add remaining content as last page
+    if current_page:
+        yield {
+            "page_number": page_num,
+            "text": "\n".join(current_page),
+            "char_count": sum(len(p) for p in current_page)
+        }
+
+def _run_text(run: ET.Element) -> str:
+    parts = []
+    for child in run:
+        if child.tag == W_T:
+            parts.append(child.text or "")
+        elif child.tag == W_BR:
+            parts.append("\n" if child.get(W_TYPE, "textWrapping") == "textWrapping" else "")
+        else:
+            parts.append(RUN_TEXT.get(child.tag, ""))
+    return "".join(parts)
+
+def _paragraph_text(paragraph: ET.Element) -> str:
+    """Same text as python-docx's Paragraph.text: direct runs and hyperlink runs"""
+    parts = []
+    for child in paragraph:
+        if child.tag == W_R:
+            parts.append(_run_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(_run_text(run) for run in child if run.tag == W_R)
+    return "".join(parts)
+
+def iter_docx_paragraphs_streaming(file_path: str) -> Iterator[str]:
+    """Stream body-level paragraph texts from word/document.xml without building the document model.
+
+    Like python-docx's Document.paragraphs, only direct children of w:body are
+    read (table and text box content is skipped). Finished elements are cleared
+    as the parser goes, so memory stays flat on huge, table-heavy documents.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open("word/document.xml") as xml_file:
+            depth = 0
+            body = None
+            body_depth = -1
+            in_paragraph = False
+            for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if depth == 1 and not elem.tag.startswith(WORD_NAMESPACE):
+                        raise ValueError(f"Unsupported document namespace: {elem.tag}")
+                    if body is None and elem.tag == W_BODY:
+                        body = elem
+                        body_depth = depth
+                    elif depth == body_depth + 1:
+                        in_paragraph = elem.tag == W_P
+                    continue
+
+                depth -= 1
+                if body is None or depth < body_depth:
+                    continue
+                if depth == body_depth:
+                    # A top-level block finished: read it if it is a paragraph, then drop it
+                    if in_paragraph:
+                        yield _paragraph_text(elem)
+                    body.clear()
+                elif not in_paragraph:
+                    # Tables and other blocks are skipped, free their content as it is parsed
+                    elem.clear()
+
+def iter_docx_pages_python_docx(file_path: str) -> Iterator[Dict]:
+    """Simulated pages through the full python-docx object model (slow, but handles unusual files)"""
+    doc = docx.Document(file_path)
+    return iter_paragraph_pages(paragraph.text for paragraph in doc.paragraphs)
+
+def iter_docx_pages(file_path: str) -> Iterator[Dict]:
+    """Yield text from DOCX by paragraphs (simulated pages), streaming document.xml with a python-docx fallback"""
+    page_count = 0
+    try:
+        try:
+            for page in iter_paragraph_pages(iter_docx_paragraphs_streaming(file_path)):
+                page_count += 1
+                yield page
+        except Exception as e:
+            # Both paths produce the same pages, so the fallback resumes after the ones already yielded
+            print(f"⚠️ Streaming DOCX extraction failed for {os.path.basename(file_path)} ({e}), using python-docx")
+            for page in iter_docx_pages_python_docx(file_path):
+                if page["page_number"] > page_count:
+                    page_count += 1
+                    yield page
+
+        print(f"📄 Extracted {page_count} sections from DOCX: {os.path.basename(file_path)}")
+    except Exception as e:
+        print(f"❌ Error extracting text from DOCX {file_path}: {e}")
+        raise
+
+def iter_txt_pages(file_path: str) -> Iterator[Dict]:
+    """Yield text from TXT file (entire content as one page)"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    yield {"page_number": 1, "text": text, "char_count": len(text)}
+
+def iter_pages(file_path: str, file_extension: str) -> Iterator[Dict]:
+    """Stream pages based on file type"""
+    if file_extension == 'pdf':
+        return iter_pdf_pages(file_path)
+    elif file_extension in ['docx', 'doc']:
+        return iter_docx_pages(file_path)
+    elif file_extension == 'txt':
+        return iter_txt_pages(file_path)
+    raise ValueError(f"Unsupported file format: {file_extension}")
+
+def extract_text_from_pdf_by_page(file_path: str) -> List[Dict]:
+    """Extract text from PDF page by page"""
+    return list(iter_pdf_pages(file_path))
+
+def extract_text_from_docx_by_page(file_path: str) -> List[Dict]:
+    """Extract text from DOCX by paragraphs (simulated pages)"""
+    return list(iter_docx_pages(file_path))
+
+def extract_text_from_txt_by_page(file_path: str) -> List[Dict]:
+    """Extract text from TXT file (entire content as one page)"""
+    return list(iter_txt_pages(file_path))
+
+def extract_pages(file_path: str, file_extension: str) -> List[Dict]:
+    """Extract pages based on file type"""
+    return list(iter_pages(file_path, file_extension))
@@ -0,0 +1,112 @@
+import os
+import json
+import mmap
+import hashlib
+import threading
+from typing import Dict, Optional, Iterable
+
+# blake2b is several times faster than MD5 in CPython and needs no extra dependency
+HASH_ALGORITHM = "blake2b"
+HASH_DIGEST_SIZE = 16
+READ_BLOCK_SIZE = 1024 * 1024  # 1 MB buffered reads
+MMAP_THRESHOLD = 8 * 1024 * 1024  # mmap files larger than 8 MB
+
+def hash_file(file_path: str, algorithm: str = HASH_ALGORITHM) -> str:
+    """Hash file content with large buffered reads, or mmap for big files"""
+    if algorithm == HASH_ALGORITHM:
+        hasher = hashlib.blake2b(digest_size=HASH_DIGEST_SIZE)
+    else:
+        hasher = hashlib.new(algorithm)
+
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                hasher.update(mapped)
+        else:
+            for block in iter(lambda: f.read(READ_BLOCK_SIZE), b""):
+                hasher.update(block)
+    return hasher.hexdigest()
+
+def stat_fingerprint(stat: os.stat_result) -> Dict[str, int]:
+    """Fields that must all match for a file to be considered unchanged"""
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "inode": stat.st_ino,
+    }
+
+class FingerprintJournal:
+    """Persistent path -> (size, mtime, inode, content hash) journal used to skip re-reading unchanged files"""
+
+    def __init__(self, journal_file: str):
+        self.journal_file = journal_file
+        self._entries: Dict[str, Dict] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.journal_file):
+            return
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable fingerprint journal: {e}")
+            self._entries = {}
+
+    def lookup(self, file_path: str, stat: os.stat_result) -> Optional[str]:
+        """Return the recorded content hash if the file's stat fingerprint is unchanged"""
+        with self._lock:
+            entry = self._entries.get(file_path)
+        if not entry or entry.get("algorithm") != HASH_ALGORITHM:
+            return None
+        fingerprint = stat_fingerprint(stat)
+        if all(entry.get(key) == value for key, value in fingerprint.items()):
+            return entry["content_hash"]
+        return None
+
+    def record(self, file_path: str, stat: os.stat_result, content_hash: str):
+        with self._lock:
+            entry = stat_fingerprint(stat)
+            entry.update({"content_hash": content_hash, "algorithm": HASH_ALGORITHM})
+            self._entries[file_path] = entry
+            self._dirty = True
+
+    def get_content_hash(self, file_path: str, stat: os.stat_result = None) -> str:
+        """Get content hash from the journal, hashing the file only when its stat changed"""
+        if stat is None:
+            stat = os.stat(file_path)
+        content_hash = self.lookup(file_path, stat)
+        if content_hash is None:
+            content_hash = hash_file(file_path)
+            self.record(file_path, stat, content_hash)
+        return content_hash
+
+    def prune(self, existing_paths: Iterable[str]):
+        """Drop entries for files that no longer exist"""
+        existing = set(existing_paths)
+        with self._lock:
+            stale = [path for path in self._entries if path not in existing]
+            for path in stale:
+                del self._entries[path]
+            if stale:
+                self._dirty = True
+
+    def save(self):
+        """Atomically persist the journal if it changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+        tmp_file = f"{self.journal_file}.tmp"
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, separators=(",", ":"))
+            os.replace(tmp_file, self.journal_file)
+        except Exception as e:
+            with self._lock:
+                self._dirty = True
+            print(f"❌ Error saving fingerprint journal: {e}")
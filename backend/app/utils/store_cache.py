@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable
+from app.config import get_settings
+
+settings = get_settings()
+
+class StoreCache:
+    """Thread-safe LRU cache of loaded vector stores, evicted under a memory budget"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._stores: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._stores.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._stores.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, store: Any, nbytes: int):
+        with self._lock:
+            previous = self._stores.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._stores[key] = (store, nbytes)
+            self.current_bytes += nbytes
+
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self.current_bytes > self.max_bytes and len(self._stores) > 1:
+                _, (_, evicted_bytes) = self._stores.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], size_of: Callable[[Any], int]):
+        """Return the cached store, loading (outside the lock) and caching it on a miss"""
+        store = self.get(key)
+        if store is None:
+            store = loader()
+            self.put(key, store, size_of(store))
+        return store
+
+    def invalidate(self, key: Hashable):
+        """Drop a store, e.g. when a new version replaces it"""
+        with self._lock:
+            entry = self._stores.pop(key, None)
+            if entry is not None:
+                self.current_bytes -= entry[1]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._stores.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._stores),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+@lru_cache()
+def get_store_cache() -> StoreCache:
+    """Process-wide cache of loaded vector stores"""
+    return StoreCache(settings.VECTOR_STORE_CACHE_MB * 1024 * 1024)
@@ -0,0 +1,88 @@
+"""Chunker micro-benchmark: the single-pass splitter against the per-call RecursiveCharacterTextSplitter.
+
+Run from backend/:  python -m benchmarks.bench_chunking --pages 2000
+"""
+import argparse
+import random
+import re
+import time
+from typing import Callable, List
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.utils.chunking import SEPARATORS, split_text, clean_chunks
+
+WORDS = (
+    "employee leave policy annual sick maternity paternity benefits salary payroll holiday "
+    "overtime remote work travel reimbursement manager approval request days year notice "
+    "period probation performance review conduct grievance insurance health dental"
+).split()
+
+def synthetic_page(rng: random.Random, words_per_page: int = 500) -> str:
+    """A page of policy-like text with paragraphs, lines and sentences of varying length"""
+    parts = []
+    for _ in range(words_per_page):
+        parts.append(rng.choice(WORDS))
+        roll = rng.random()
+        if roll < 0.06:
+            parts.append(rng.choice([". ", "! ", "? "]))
+        elif roll < 0.08:
+            parts.append(".\n")
+        elif roll < 0.09:
+            parts.append(".\n\n")
+        else:
+            parts.append(" ")
+    return "".join(parts)
+
+def baseline_chunk(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """The previous chunk_text: a new splitter per call, then a regex per chunk"""
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=list(SEPARATORS)
+    )
+    cleaned_chunks = []
+    for chunk in text_splitter.split_text(text):
+        chunk = chunk.strip()
+        if chunk and len(chunk) > 50:
+            cleaned_chunks.append(re.sub(r'\s+', ' ', chunk))
+    return cleaned_chunks
+
+def fast_chunk(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    return clean_chunks(split_text(text, chunk_size, chunk_overlap))
+
+def run(name: str, chunker: Callable, pages: List[str], chunk_size: int, chunk_overlap: int, repeat: int) -> float:
+    best = float("inf")
+    chunk_count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunk_count = sum(len(chunker(page, chunk_size, chunk_overlap)) for page in pages)
+        best = min(best, time.perf_counter() - start)
+    rate = chunk_count / best
+    print(f"{name:<28} {chunk_count:>8} chunks  {best:8.3f}s  {rate:>12,.0f} chunks/s")
+    return rate
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=800)
+    parser.add_argument("--chunk-overlap", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = [synthetic_page(rng) for _ in range(args.pages)]
+
+    # Identical boundaries first, speed second
+    mismatches = sum(
+        baseline_chunk(page, args.chunk_size, args.chunk_overlap) != fast_chunk(page, args.chunk_size, args.chunk_overlap)
+        for page in pages
+    )
+    print(f"📄 {len(pages)} pages, {sum(map(len, pages)):,} chars, {mismatches} page(s) with different chunks\n")
+
+    baseline = run("RecursiveCharacterTextSplitter", baseline_chunk, pages, args.chunk_size, args.chunk_overlap, args.repeat)
+    fast = run("single-pass split_text", fast_chunk, pages, args.chunk_size, args.chunk_overlap, args.repeat)
+    print(f"\n🚀 Speedup: {fast / baseline:.2f}x")
+
+if __name__ == "__main__":
+    main()
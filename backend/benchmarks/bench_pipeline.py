@@ -0,0 +1,194 @@
+"""End-to-end benchmark: ingestion throughput, query latency and peak memory on a synthetic corpus.
+
+Run from backend/:  python -m benchmarks.bench_pipeline --docs 60 --pages 10 --queries 200 --output bench.json
+
+The LLM is always replaced by a canned response so runs work offline;
+--stub-embeddings also replaces the sentence-transformers model with a
+deterministic hashing encoder, to benchmark the pipeline without the model.
+Results are written as JSON (with the git commit) to compare across commits.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import asyncio
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMBEDDING_DIMENSION = 384  # all-MiniLM-L6-v2
+
+class HashingEncoder:
+    """Stand-in for SentenceTransformer: bag of hashed words, L2-normalised"""
+
+    def __init__(self, model_name: str = None, *args, **kwargs):
+        self.model_name = model_name
+
+    def encode(self, texts, normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                digest = hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest()
+                vectors[row, int.from_bytes(digest, "little") % EMBEDDING_DIMENSION] += 1.0
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms > 0, norms, 1.0)
+        return vectors
+
+class CannedCompletions:
+    """Stand-in for the Groq client: answers instantly with a fixed response"""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model: str, messages: List[Dict], **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content="- Benchmark answer\n\n**Sources:**\n- benchmark")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak resident set size of this process and of its (finished) worker processes"""
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1),
+    }
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+async def run(args) -> Dict:
+    # DocumentService works in ./uploads and ./vector_store, so the app is imported from inside the workdir
+    sys.path.insert(0, BACKEND_DIR)
+    if args.stub_embeddings:
+        import app.utils.embeddings as embeddings_module
+        embeddings_module.SentenceTransformer = HashingEncoder
+    from benchmarks.corpus import generate_corpus, generate_questions
+    from app.services.document_service import DocumentService
+
+    print(f"📄 Generating {args.docs} documents x {args.pages} pages ({args.formats})...")
+    start = time.perf_counter()
+    corpus = generate_corpus("./uploads", args.docs, args.pages, args.words_per_page, args.formats.split(","), args.seed)
+    corpus_seconds = time.perf_counter() - start
+
+    document_service = DocumentService()
+    rag_service = document_service.rag_service
+    rag_service.groq_client = CannedCompletions()
+
+    print("🚀 Indexing the corpus...")
+    start = time.perf_counter()
+    processed = await document_service.process_existing_documents()
+    ingest_seconds = time.perf_counter() - start
+    indexed = [doc for doc in processed if doc.get("status") != "error"]
+    chunks = sum(doc.get("chunk_count") or 0 for doc in indexed)
+
+    print("🔁 Rescanning the unchanged corpus...")
+    start = time.perf_counter()
+    await document_service.process_existing_documents()
+    rescan_seconds = time.perf_counter() - start
+
+    documents = await document_service.get_processed_documents()
+    questions = generate_questions(args.queries, args.seed)
+    for question in questions[:args.warmup]:
+        rag_service.query_documents_with_versions(question, documents, document_service)
+
+    print(f"❓ Running {len(questions)} queries...")
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        rag_service.query_documents_with_versions(question, documents, document_service)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    document_service.pipeline.shutdown()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "docs": args.docs,
+            "pages": args.pages,
+            "words_per_page": args.words_per_page,
+            "formats": args.formats,
+            "queries": args.queries,
+            "seed": args.seed,
+            "stub_embeddings": args.stub_embeddings,
+        },
+        "corpus": {
+            "documents": len(corpus),
+            "megabytes": round(sum(doc["bytes"] for doc in corpus) / 1024 / 1024, 2),
+            "generate_seconds": round(corpus_seconds, 2),
+        },
+        "ingestion": {
+            "documents_indexed": len(indexed),
+            "errors": len(processed) - len(indexed),
+            "chunks": chunks,
+            "seconds": round(ingest_seconds, 3),
+            "docs_per_second": round(len(indexed) / ingest_seconds, 2) if ingest_seconds else None,
+            "chunks_per_second": round(chunks / ingest_seconds, 1) if ingest_seconds else None,
+            "unchanged_rescan_seconds": round(rescan_seconds, 3),
+        },
+        "query_latency_ms": {
+            "count": len(latencies),
+            "mean": round(float(np.mean(latencies)), 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "max": round(max(latencies), 2) if latencies else 0.0,
+        },
+        "stub_llm_calls": rag_service.groq_client.calls,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=60)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--formats", default="pdf,docx,txt")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed queries run first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stub-embeddings", action="store_true", help="Use a hashing encoder instead of the embedding model")
+    parser.add_argument("--workdir", help="Directory for the corpus and indexes (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory afterwards")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="rag_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        os.chdir(previous_dir)
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {output}")
+
+if __name__ == "__main__":
+    main()
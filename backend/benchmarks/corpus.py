@@ -0,0 +1,168 @@
+"""Synthetic policy corpus generator (PDF, DOCX, TXT) for the benchmarks.
+
+Run from backend/:  python -m benchmarks.corpus ./bench_uploads --docs 100 --pages 20
+"""
+import os
+import random
+import argparse
+from typing import Dict, List
+import docx
+
+FOLDERS = ["hr", "hr/leave", "finance", "legal", "it"]
+
+TOPICS = {
+    "hr": ["onboarding", "probation", "performance review", "code of conduct", "grievance", "remote work"],
+    "hr/leave": ["annual leave", "sick leave", "maternity leave", "paternity leave", "public holidays", "carry over"],
+    "finance": ["expense claims", "travel reimbursement", "payroll", "corporate cards", "per diem", "budget approval"],
+    "legal": ["data protection", "confidentiality", "contract signing", "compliance training", "whistleblowing", "retention"],
+    "it": ["password policy", "laptop return", "vpn access", "software requests", "incident reporting", "backups"],
+}
+
+WORDS = (
+    "employee employees manager approval request days year notice period policy section applies eligible "
+    "must may should within calendar working business submit form portal department team company records "
+    "effective date entitled maximum minimum additional exceptions reviewed annually accordance local law"
+).split()
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+
+QUESTION_TEMPLATES = [
+    "How many days of {topic} do employees get?",
+    "What is the process for {topic}?",
+    "Who approves {topic} requests?",
+    "When was the {topic} policy last updated?",
+    "What are the exceptions to the {topic} rules?",
+]
+
+def policy_sentence(rng: random.Random, topic: str) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 22))]
+    words.insert(rng.randrange(len(words)), topic)
+    if rng.random() < 0.2:
+        words.append(f"from {rng.randint(1, 28)} {rng.choice(MONTHS)} {rng.randint(2019, 2025)}")
+    if rng.random() < 0.3:
+        words.append(f"up to {rng.randint(2, 30)} days")
+    sentence = " ".join(words)
+    return sentence[0].upper() + sentence[1:] + "."
+
+def policy_page(rng: random.Random, folder: str, words_per_page: int) -> List[str]:
+    """Paragraphs of one page about the folder's topics"""
+    paragraphs = []
+    word_count = 0
+    while word_count < words_per_page:
+        topic = rng.choice(TOPICS[folder])
+        paragraph = " ".join(policy_sentence(rng, topic) for _ in range(rng.randint(2, 6)))
+        paragraphs.append(paragraph)
+        word_count += len(paragraph.split())
+    return paragraphs
+
+def write_txt(path: str, pages: List[List[str]]):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join("\n\n".join(page) for page in pages))
+
+def write_docx(path: str, pages: List[List[str]]):
+    document = docx.Document()
+    for page_number, page in enumerate(pages, start=1):
+        document.add_heading(f"Section {page_number}", level=2)
+        for paragraph in page:
+            document.add_paragraph(paragraph)
+    document.save(path)
+
+# Lines of 9pt text at 11pt leading that fit between the top and bottom margins of an A4 page
+PDF_LINES_PER_PAGE = 70
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _wrap(paragraph: str, width: int = 95) -> List[str]:
+    lines, line = [], ""
+    for word in paragraph.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+def write_pdf(path: str, pages: List[List[str]]):
+    """Minimal text-only PDF (Helvetica), readable by PyPDF2, with no extra dependency.
+
+    A page with more lines than fit on A4 continues on further PDF pages,
+    so every word is written whatever --words-per-page asks for.
+    """
+    objects: List[bytes] = [b"", b""]  # 1: catalog, 2: page tree, filled in below
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    font_id = len(objects)
+    page_ids = []
+    sheets = []
+    for page in pages:
+        lines = [line for paragraph in page for line in _wrap(paragraph) + [""]]
+        sheets.extend(lines[start:start + PDF_LINES_PER_PAGE] for start in range(0, max(len(lines), 1), PDF_LINES_PER_PAGE))
+    for lines in sheets:
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        content = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (font_id, content_id)
+        )
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, "wb") as f:
+        f.write(out)
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx, "txt": write_txt}
+
+def generate_corpus(root: str, docs: int = 50, pages: int = 10, words_per_page: int = 400,
+                    formats: List[str] = None, seed: int = 42) -> List[Dict]:
+    """Write docs synthetic policy documents under root, spread over FOLDERS and formats"""
+    formats = formats or list(WRITERS)
+    rng = random.Random(seed)
+    written = []
+    for index in range(docs):
+        folder = FOLDERS[index % len(FOLDERS)]
+        extension = formats[index % len(formats)]
+        topic = TOPICS[folder][index % len(TOPICS[folder])]
+        filename = f"{topic.replace(' ', '_')}_{index:04d}.{extension}"
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        path = os.path.join(root, folder, filename)
+        WRITERS[extension](path, [policy_page(rng, folder, words_per_page) for _ in range(pages)])
+        written.append({"path": path, "folder": folder, "format": extension, "bytes": os.path.getsize(path)})
+    return written
+
+def generate_questions(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        rng.choice(QUESTION_TEMPLATES).format(topic=rng.choice(TOPICS[rng.choice(FOLDERS)]))
+        for _ in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root")
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--formats", default="pdf,docx,txt")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    written = generate_corpus(args.root, args.docs, args.pages, args.words_per_page, args.formats.split(","), args.seed)
+    total_bytes = sum(doc["bytes"] for doc in written)
+    print(f"📄 Wrote {len(written)} documents ({total_bytes / 1024 / 1024:.1f} MB) under {args.root}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+import json
+from app.services.document_service import DocumentService
+from app.services.vector_index import INDEX_TYPES
+from app.config import get_settings
+
+
+settings = get_settings()
+
+async def build(args: argparse.Namespace):
+    """Convert global index partitions to the configured index type, training IVF-PQ from a sample"""
+    index_type = args.type or settings.VECTOR_INDEX_TYPE
+
+    print("=" * 70)
+    print(f"🏗️ Building global vector index partitions as {index_type} (min {settings.ANN_MIN_VECTORS} vectors)")
+    print("=" * 70)
+
+    rebuilt = await DocumentService().build_vector_index(index_type=index_type, retrain=args.retrain)
+
+    if args.json:
+        print(json.dumps(rebuilt, indent=2))
+        return
+
+    print("\n📊 Summary:")
+    print(f"   🧱 Partitions rebuilt: {len(rebuilt)}")
+    for entry in rebuilt:
+        print(f"   - {entry['partition'] or '/'}: {entry['from']} → {entry['to']}, {entry['vectors']} vectors, {entry['seconds']}s")
+    print("=" * 70)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build approximate nearest neighbour partitions of the global vector index")
+    parser.add_argument("--type", choices=INDEX_TYPES, default=None, help="Index type (default: VECTOR_INDEX_TYPE)")
+    parser.add_argument("--retrain", action="store_true", help="Retrain IVF-PQ partitions on a fresh sample of their vectors")
+    parser.add_argument("--json", action="store_true", help="Print the rebuilt partitions as JSON")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(build(parse_args()))
@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import json
+from app.services.document_service import DocumentService
+from app.config import get_settings
+
+
+settings = get_settings()
+
+async def compact(args: argparse.Namespace):
+    """Reclaim the space of superseded and orphaned vector stores"""
+
+    print("=" * 70)
+    print(f"🧹 Compacting {settings.VECTOR_STORE_PATH}{' (dry run)' if args.dry_run else ''}")
+    print("=" * 70)
+
+    report = await DocumentService().compact_vector_stores(
+        dry_run=args.dry_run,
+        keep_versions=args.keep_versions,
+        retention_days=args.retention_days,
+        archive_dir=args.archive_dir
+    )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("\n📊 Summary:")
+    print(f"   🗑️  Expired directories:  {len(report['expired_directories'])}")
+    print(f"   👻 Orphaned directories: {len(report['orphaned_directories'])}")
+    print(f"   📦 Imported directories: {len(report['imported_directories'])}")
+    print(f"   🧩 Stale index chunks:   {report['index_chunks_removed']}")
+    print(f"   💾 Bytes reclaimed:      {report['bytes_reclaimed']:,} ({report['bytes_reclaimed'] / 1024 / 1024:.1f} MB)")
+    print("=" * 70)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Garbage-collect superseded and orphaned vector stores")
+    parser.add_argument("--keep-versions", type=int, default=None, help="Versions kept per document (default: VERSION_RETENTION_COUNT)")
+    parser.add_argument("--retention-days", type=int, default=None, help="Also keep versions processed within this many days (default: VERSION_RETENTION_DAYS)")
+    parser.add_argument("--archive-dir", default=None, help="Move expired stores here instead of deleting them (default: COMPACTION_ARCHIVE_PATH)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be reclaimed")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(compact(parse_args()))
@@ -1,157 +1,163 @@
+import argparse
 import asyncio
+import json
 import os
-from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
 from app.services.document_service import DocumentService
-from app.utils.security import get_password_hash
 from app.config import get_settings
-from datetime import datetime, timezone
 
 
 settings = get_settings()
 
-async def seed_shared_documents():
-    """Seed shared documents for all users"""
-    
+DEFAULT_CHECKPOINT = os.path.join(settings.VECTOR_STORE_PATH, "reindex_checkpoint.json")
+
+def load_checkpoint(path: str) -> Dict:
+    """Load the checkpoint of an interrupted run"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable checkpoint {path}: {e}")
+        return {}
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    """Atomically write the checkpoint"""
+    checkpoint["updated_at"] = datetime.now(timezone.utc).isoformat()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def file_state(doc: Dict) -> Dict:
+    """Size and mtime recorded in the checkpoint, so a file edited after it was indexed is picked up again"""
+    return {"size": doc["file_size"], "mtime": doc["file_modified"]}
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+def print_progress(stats: Dict, done: int, total: int, elapsed: float):
+    docs_per_s = stats["processed"] / elapsed if elapsed else 0.0
+    chunks_per_s = stats["chunks"] / elapsed if elapsed else 0.0
+    scanned_per_s = stats["scanned"] / elapsed if elapsed else 0.0
+    eta = format_duration((total - done) / scanned_per_s) if scanned_per_s else "?"
+    print(
+        f"📈 [{done}/{total}] {done / total * 100 if total else 100:5.1f}% | "
+        f"✅ {stats['processed']} ⏭️  {stats['skipped']} ❌ {stats['failed']} | "
+        f"{docs_per_s:.2f} docs/s | {chunks_per_s:.1f} chunks/s | ETA {eta}",
+        flush=True
+    )
+
+async def reindex(args: argparse.Namespace):
+    """Bulk (re)index ./uploads through the same ingestion pipeline as the server"""
+
     print("=" * 70)
-    print("🌍 Seeding SHARED Documents (Available to ALL Users)")
+    print("🌍 Bulk indexing shared documents (available to ALL users)")
     print("=" * 70)
-    
-    # Connect to MongoDB
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
-    db = client[settings.DATABASE_NAME]
-    users_collection = db.users
-    documents_collection = db.documents
-    
-    # Create or get system user for shared documents
-    system_user = await users_collection.find_one({"username": "system"})
-    
-    if not system_user:
-        print("\n📝 Creating system user for shared documents...")
-        system_user_dict = {
-            "email": "system@docuchat.ai",
-            "username": "system",
-            "hashed_password": get_password_hash("system_password_do_not_share"),
-            "is_active": True,
-            "created_at": datetime.now(timezone.utc)
-
-        }
-        result = await users_collection.insert_one(system_user_dict)
-        system_user_id = str(result.inserted_id)
-        print(f"✅ System user created")
-    else:
-        system_user_id = str(system_user["_id"])
-        print(f"✅ Using existing system user")
-    
-    # Path to uploads folder
-    uploads_folder = "./uploads"
-    
-    if not os.path.exists(uploads_folder):
-        print(f"\n❌ Uploads folder not found: {uploads_folder}")
-        client.close()
-        return
-    
-    # Get all documents in folder
-    supported_extensions = ('.pdf', '.docx', '.txt', '.doc')
-    files = [f for f in os.listdir(uploads_folder) 
-             if f.lower().endswith(supported_extensions)]
-    
-    if not files:
-        print(f"\n⚠️  No documents found in {uploads_folder}")
-        print(f"   Supported formats: {', '.join(supported_extensions)}")
-        client.close()
-        return
-    
-    print(f"\n📄 Found {len(files)} document(s) in uploads/:")
-    for f in files:
-        file_size = os.path.getsize(os.path.join(uploads_folder, f))
-        print(f"   📎 {f} ({file_size / 1024:.1f} KB)")
-    
-    # Initialize document service
+
     doc_service = DocumentService()
-    
-    print("\n🔄 Processing shared documents...\n")
-    
-    processed = 0
-    skipped = 0
-    failed = 0
-    
-    for filename in files:
-        file_path = os.path.join(uploads_folder, filename)
-        
-        # Check if already processed (check by filename and is_shared=True)
-        existing = await documents_collection.find_one({
-            "filename": filename,
-            "is_shared": True
-        })
-        
-        if existing:
-            print(f"⏭️  {filename:<45} Already shared")
-            skipped += 1
+    if args.workers:
+        doc_service.pipeline.workers = args.workers
+
+    all_documents = doc_service.get_all_documents_recursive()
+    if not all_documents:
+        print(f"\n⚠️  No documents found in {doc_service.upload_dir}")
+        print("   Supported formats: .pdf, .docx, .doc, .txt")
+        return
+
+    checkpoint = {} if args.restart else load_checkpoint(args.checkpoint)
+    completed: Dict[str, Dict] = checkpoint.get("completed", {})
+    failed: Dict[str, str] = checkpoint.get("failed", {})
+    stats = checkpoint.get("stats", {"scanned": 0, "processed": 0, "skipped": 0, "failed": 0, "chunks": 0, "elapsed": 0.0})
+    if checkpoint:
+        print(f"\n♻️  Resuming from checkpoint: {len(completed)} done, {len(failed)} failed")
+
+    remaining: List[Dict] = []
+    for doc in all_documents:
+        if completed.get(doc["file_path"]) == file_state(doc):
+            continue
+        if doc["file_path"] in failed and not args.retry_failed:
             continue
-        
-        try:
-            print(f"🔄 {filename:<45} Processing...", end='', flush=True)
-            
-            # Extract text based on file type
-            file_extension = filename.split('.')[-1].lower()
-            
-            if file_extension == 'pdf':
-                text = doc_service.extract_text_from_pdf(file_path)
-            elif file_extension in ['docx', 'doc']:
-                text = doc_service.extract_text_from_docx(file_path)
-            elif file_extension == 'txt':
-                text = doc_service.extract_text_from_txt(file_path)
-            else:
-                print(f"\r❌ {filename:<45} Unsupported format")
-                failed += 1
-                continue
-            
-            # Get file size
-            file_size = os.path.getsize(file_path)
-            
-            # Create vector store
-            vector_store_id, chunk_count = doc_service.rag_service.create_vector_store(
-                text, 
-                "shared"  # Document ID for shared docs
-            )
-            
-            # Save to database as SHARED document
-            document_dict = {
-                "filename": filename,
-                "file_path": file_path,
-                "file_type": file_extension,
-                "file_size": file_size,
-                "vector_store_id": vector_store_id,
-                "owner_id": system_user_id,  # Owned by system
-                "is_shared": True,  # ← SHARED FOR ALL USERS
-                "chunk_count": chunk_count,
-                "uploaded_at": datetime.now(timezone.utc)
-
-            }
-            
-            await documents_collection.insert_one(document_dict)
-            
-            print(f"\r✅ {filename:<45} {chunk_count} chunks | 🌍 SHARED")
-            processed += 1
-            
-        except Exception as e:
-            print(f"\r❌ {filename:<45} Error: {str(e)[:30]}")
-            failed += 1
-    
+        remaining.append(doc)
+
+    total = len(all_documents)
+    print(f"\n📄 {total} document(s) found, {len(remaining)} left to check, {doc_service.pipeline.workers} worker(s)\n")
+
+    previous_elapsed = stats["elapsed"]
+    run_start = time.time()
+
+    try:
+        for start in range(0, len(remaining), args.checkpoint_every):
+            batch = remaining[start:start + args.checkpoint_every]
+
+            # The server may be ingesting too: each batch is one locked load-modify-save pass
+            async with doc_service.index_writer():
+                jobs, errors = await doc_service.find_pending_jobs(batch)
+                results = errors + await doc_service.index_jobs(jobs)
+                await doc_service.save_index_state()
+
+            failed_paths = set()
+            for result in results:
+                if result["status"] == "error":
+                    failed_paths.add(result.get("file_path"))
+                    failed[result.get("file_path")] = result["error"]
+                    stats["failed"] += 1
+                else:
+                    stats["processed"] += 1
+                    stats["chunks"] += result["chunk_count"]
+            stats["skipped"] += len(batch) - len(results)
+            stats["scanned"] += len(batch)
+
+            for doc in batch:
+                if doc["file_path"] not in failed_paths:
+                    completed[doc["file_path"]] = file_state(doc)
+                    failed.pop(doc["file_path"], None)
+
+            stats["elapsed"] = previous_elapsed + time.time() - run_start
+            save_checkpoint(args.checkpoint, {"completed": completed, "failed": failed, "stats": stats})
+            print_progress(stats, len(completed) + len(failed), total, stats["elapsed"])
+    finally:
+        doc_service.pipeline.shutdown()
+
+    # A full pass finished, so the fingerprint journal can drop deleted files
+    async with doc_service.index_writer():
+        await doc_service.save_index_state(all_documents)
+
+    elapsed = stats["elapsed"]
     print("\n" + "=" * 70)
     print("📊 Summary:")
-    print(f"   ✅ Processed: {processed}")
-    print(f"   ⏭️  Skipped:   {skipped}")
-    print(f"   ❌ Failed:    {failed}")
+    print(f"   ✅ Processed: {stats['processed']} ({stats['chunks']} chunks)")
+    print(f"   ⏭️  Unchanged: {stats['skipped']}")
+    print(f"   ❌ Failed:    {stats['failed']}")
+    print(f"   ⏱️  Elapsed:   {format_duration(elapsed)}")
+    if elapsed:
+        print(f"   🚀 Throughput: {stats['processed'] / elapsed:.2f} docs/s, {stats['chunks'] / elapsed:.1f} chunks/s")
     print("=" * 70)
-    
-    if processed > 0:
-        print("\n🎉 Shared documents successfully registered!")
-        print("🌍 ALL users can now query these documents!")
-        print(f"💬 Users can ask questions at http://localhost:3000")
-    
-    client.close()
+
+    for file_path, error in failed.items():
+        print(f"   ❌ {file_path}: {error[:80]}")
+
+    if not failed:
+        if os.path.exists(args.checkpoint):
+            os.remove(args.checkpoint)
+        print("\n🎉 All documents indexed! ALL users can now query them.")
+    else:
+        print(f"\n💾 Checkpoint kept at {args.checkpoint}, rerun with --retry-failed to retry failures")
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Resumable bulk indexing of ./uploads")
+    parser.add_argument("--workers", type=int, default=0, help="Extraction processes (default: INGESTION_WORKERS or one per core)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file used to resume an interrupted run")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="Documents indexed between checkpoints")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry documents that failed in a previous run")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    asyncio.run(seed_shared_documents())
\ No newline at end of file
+    asyncio.run(reindex(parse_args()))
@@ -0,0 +1,43 @@
+import random
+import re
+import pytest
+
+text_splitter = pytest.importorskip("langchain.text_splitter")
+
+from app.utils.chunking import SEPARATORS, split_text, clean_chunks
+
+WORDS = "leave policy annual sick benefits salary holiday overtime remote travel approval notice probation".split()
+
+def random_text(rng: random.Random, words: int) -> str:
+    """Words joined by every separator the splitter knows, plus runs of whitespace and unbroken long words"""
+    parts = []
+    for _ in range(words):
+        roll = rng.random()
+        if roll < 0.01:
+            parts.append("x" * rng.randint(100, 400))
+        else:
+            parts.append(rng.choice(WORDS))
+        parts.append(rng.choice([" "] * 20 + [". ", "! ", "? ", ".\n", ".\n\n", "  ", "\n \n", "\t"]))
+    return "".join(parts)
+
+def recursive_splitter(chunk_size: int, chunk_overlap: int):
+    return text_splitter.RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len, separators=list(SEPARATORS)
+    )
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(800, 100), (200, 50), (120, 0), (60, 30)])
+def test_same_chunks_as_recursive_character_text_splitter(chunk_size, chunk_overlap):
+    rng = random.Random(chunk_size * 1000 + chunk_overlap)
+    splitter = recursive_splitter(chunk_size, chunk_overlap)
+    for _ in range(200):
+        text = random_text(rng, rng.randint(0, 600))
+        assert split_text(text, chunk_size, chunk_overlap) == splitter.split_text(text)
+
+@pytest.mark.parametrize("text", ["", "   ", "a", "no separators at all" * 40, "x" * 2000, "one.\n\ntwo.\n\n\n\nthree"])
+def test_edge_cases_match(text):
+    assert split_text(text, 100, 20) == recursive_splitter(100, 20).split_text(text)
+
+def test_clean_chunks_matches_the_regex_it_replaced():
+    chunks = ["  short  ", "a\tlong\n\nchunk  with   mixed whitespace " * 3, "\n" + "y" * 51 + "\n"]
+    expected = [re.sub(r'\s+', ' ', chunk.strip()) for chunk in chunks if chunk.strip() and len(chunk.strip()) > 50]
+    assert clean_chunks(chunks) == expected
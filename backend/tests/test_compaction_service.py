@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from app.services.compaction_service import CompactionService
+from app.services.metadata_store import MetadataStore
+from app.services.vector_index import VectorIndex
+from app.utils.store_cache import StoreCache
+
+DIMENSION = 16
+
+def test_removed_index_chunks_leave_the_disk(tmp_path):
+    index = VectorIndex(str(tmp_path / "global_index"), use_mmap=False)
+    rng = np.random.default_rng(0)
+    for store in range(4):
+        texts = [f"store {store} chunk {i} " + "filler " * 200 for i in range(50)]
+        index.add_store(f"vs-{store}", texts, rng.random((50, DIMENSION), dtype=np.float32), [{}] * 50)
+        # One save per version, as ingestion does, so the chunk text is spread over appended files
+        index.save()
+
+    metadata_store = MetadataStore(str(tmp_path / "metadata.db"))
+    file_metadata = {"content_hash": "ab" * 16, "filename": "policy.pdf"}
+    for store in range(1, 4):
+        metadata_store.add_version(f"policy-{store}.pdf", {"vector_store_id": f"vs-{store}", "file_metadata": file_metadata})
+    rag_service = SimpleNamespace(vector_index=index, store_cache=StoreCache(0), remove_vector_store=index.remove_store)
+    compactor = CompactionService(rag_service, metadata_store, vector_store_dir=str(tmp_path))
+
+    report = compactor.run(keep_versions=1, retention_days=0, archive_dir="")
+
+    assert report["orphaned_index_stores"] == 1
+    assert report["index_chunks_removed"] == 50
+    # The removed version's text is gone from the chunk files, even though appending would not have rewritten them yet
+    assert report["index_bytes_reclaimed"] > 50 * 1000
+    assert len(index.chunk_files) == len(index.lexical_files) == 1
+
+    reloaded = VectorIndex(str(tmp_path / "global_index"), use_mmap=False)
+    assert sorted(reloaded.store_ids()) == ["vs-1", "vs-2", "vs-3"]
+    assert reloaded.get_chunk(reloaded.store_chunks["vs-3"][0])["content"].startswith("store 3 chunk 0")
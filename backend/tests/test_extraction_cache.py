@@ -0,0 +1,48 @@
+import pytest
+
+from app.utils import extractors
+from app.utils import extraction_cache as extraction_cache_module
+from app.utils.extraction_cache import ExtractionCache
+
+CONTENT_HASH = "ab" * 16
+
+def page(number: int) -> dict:
+    text = f"page {number}"
+    return {"page_number": number, "text": text, "char_count": len(text)}
+
+class FailingPage:
+    def extract_text(self):
+        raise ValueError("corrupt page 2")
+
+class PageOne:
+    def extract_text(self):
+        return "page 1"
+
+class FailingReader:
+    """PDF reader whose second page cannot be parsed"""
+
+    def __init__(self, file):
+        self.pages = [PageOne(), FailingPage(), PageOne()]
+
+def test_extractor_failing_mid_document_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractors.PyPDF2, "PdfReader", FailingReader)
+    pdf_path = tmp_path / "doc.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4")
+    cache = ExtractionCache(str(tmp_path / "cache"))
+
+    pages = []
+    with pytest.raises(ValueError, match="corrupt page 2"):
+        for extracted in cache.iter_pages(str(pdf_path), "pdf", CONTENT_HASH):
+            pages.append(extracted)
+
+    assert pages == [page(1)]
+    assert not cache.has(CONTENT_HASH, "pdf")
+    assert not any(path.is_file() for path in (tmp_path / "cache").rglob("*"))
+
+def test_complete_extraction_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_cache_module, "iter_pages", lambda file_path, file_extension: iter([page(1), page(2)]))
+    cache = ExtractionCache(str(tmp_path))
+
+    assert list(cache.iter_pages("doc.pdf", "pdf", CONTENT_HASH)) == [page(1), page(2)]
+    assert cache.has(CONTENT_HASH, "pdf")
+    assert list(cache.iter_cached(CONTENT_HASH, "pdf")) == [page(1), page(2)]
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+
+from app.utils import fingerprints
+from app.utils.fingerprints import FingerprintJournal, hash_file
+
+def counting_hash(monkeypatch):
+    calls = []
+    real_hash_file = fingerprints.hash_file
+
+    def hash_file_counted(file_path, *args):
+        calls.append(file_path)
+        return real_hash_file(file_path, *args)
+
+    monkeypatch.setattr(fingerprints, "hash_file", hash_file_counted)
+    return calls
+
+def test_unchanged_files_are_not_read_again(tmp_path, monkeypatch):
+    calls = counting_hash(monkeypatch)
+    path = tmp_path / "policy.txt"
+    path.write_text("leave policy v1")
+    journal_file = str(tmp_path / "fingerprints.json")
+    journal = FingerprintJournal(journal_file)
+
+    first = journal.get_content_hash(str(path))
+    assert journal.get_content_hash(str(path)) == first
+    assert len(calls) == 1
+
+    # The journal survives a restart, so a rescan is stat-only
+    journal.save()
+    restarted = FingerprintJournal(journal_file)
+    assert restarted.get_content_hash(str(path)) == first
+    assert len(calls) == 1
+
+def test_changed_stat_fields_force_a_rehash(tmp_path, monkeypatch):
+    calls = counting_hash(monkeypatch)
+    path = tmp_path / "policy.txt"
+    path.write_text("leave policy v1")
+    journal = FingerprintJournal(str(tmp_path / "fingerprints.json"))
+    first = journal.get_content_hash(str(path))
+
+    # Same size, only the modification time moves
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert journal.get_content_hash(str(path)) == first
+    assert len(calls) == 2
+
+    # Replaced by a new file (new inode) with the same size and mtime
+    stat = path.stat()
+    replacement = tmp_path / "replacement.txt"
+    replacement.write_text("leave policy v2")
+    os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(replacement, path)
+    second = journal.get_content_hash(str(path))
+    assert second != first
+    assert len(calls) == 3
+
+def test_entries_of_another_algorithm_are_ignored(tmp_path, monkeypatch):
+    calls = counting_hash(monkeypatch)
+    path = tmp_path / "policy.txt"
+    path.write_text("leave policy v1")
+    journal_file = tmp_path / "fingerprints.json"
+    # Written before the hash algorithm changed: stat fields still match, the hash must not be trusted
+    entry = dict(fingerprints.stat_fingerprint(path.stat()), content_hash="0" * 32, algorithm="md5")
+    journal_file.write_text(json.dumps({str(path): entry}))
+    journal = FingerprintJournal(str(journal_file))
+
+    assert journal.get_content_hash(str(path)) == hash_file(str(path))
+    assert len(calls) == 1
+
+def test_prune_drops_missing_files(tmp_path):
+    journal_file = str(tmp_path / "fingerprints.json")
+    journal = FingerprintJournal(journal_file)
+    kept, gone = tmp_path / "kept.txt", tmp_path / "gone.txt"
+    for path in (kept, gone):
+        path.write_text(path.name)
+        journal.get_content_hash(str(path))
+
+    journal.prune([str(kept)])
+    journal.save()
+    restarted = FingerprintJournal(journal_file)
+    assert restarted.lookup(str(kept), kept.stat()) is not None
+    assert restarted.lookup(str(gone), gone.stat()) is None
+
+def test_hash_file_reads_and_maps_alike(tmp_path, monkeypatch):
+    path = tmp_path / "big.bin"
+    path.write_bytes(os.urandom(3 * 1024 * 1024 + 7))
+    expected = hashlib.blake2b(path.read_bytes(), digest_size=fingerprints.HASH_DIGEST_SIZE).hexdigest()
+    assert hash_file(str(path)) == expected
+    monkeypatch.setattr(fingerprints, "MMAP_THRESHOLD", 1024)
+    assert hash_file(str(path)) == expected
+    assert hash_file(str(path), "md5") == hashlib.md5(path.read_bytes()).hexdigest()
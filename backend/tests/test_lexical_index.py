@@ -0,0 +1,101 @@
+import math
+import random
+import pytest
+
+from app.services import lexical_index as lexical_index_module
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+WORDS = "leave annual sick carry-over form 27b clause 4.2.1 payroll remote travel notice probation".split()
+
+def reference_bm25(chunks, query, k1, b):
+    """Textbook BM25 over {chunk id: text}, summed per query term"""
+    tokens = {chunk_id: tokenize(text) for chunk_id, text in chunks.items()}
+    average_length = sum(len(t) for t in tokens.values()) / len(tokens)
+    scores = {}
+    for term in set(tokenize(query)):
+        frequency = sum(term in t for t in tokens.values())
+        if not frequency:
+            continue
+        idf = math.log(1 + (len(tokens) - frequency + 0.5) / (frequency + 0.5))
+        for chunk_id, chunk_tokens in tokens.items():
+            tf = chunk_tokens.count(term)
+            if tf:
+                norm = k1 * (1 - b + b * len(chunk_tokens) / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+    return scores
+
+def assert_matches_reference(index, chunks, query):
+    settings = lexical_index_module.settings
+    expected = reference_bm25(chunks, query, settings.BM25_K1, settings.BM25_B)
+    hits = index.search(query, k=len(chunks))
+    assert {chunk_id: pytest.approx(score, rel=1e-5) for score, chunk_id in hits} == expected
+    scores = [score for score, _ in hits]
+    assert scores == sorted(scores, reverse=True)
+
+def build(rng, versions=20, chunks_per_version=5):
+    index = LexicalIndex()
+    chunks, owner = {}, {}
+    chunk_id = 0
+    for version in range(versions):
+        ids, texts = [], []
+        for _ in range(chunks_per_version):
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 30)))
+            ids.append(chunk_id)
+            texts.append(text)
+            chunks[chunk_id] = text
+            owner[chunk_id] = f"vs-{version}"
+            chunk_id += 1
+        index.add(f"vs-{version}", ids, texts)
+    return index, chunks, owner
+
+def test_tokenize_keeps_codes_and_splits_compounds():
+    assert tokenize("The Carry-Over of Form 27B under clause 4.2.1") == ["carry-over", "carry", "over", "form", "27b", "under", "clause", "4.2.1"]
+
+def test_scores_match_reference_bm25():
+    index, chunks, _ = build(random.Random(0))
+    for query in ("annual leave", "form 27b", "clause 4.2.1 notice", "carry over", "unknown words"):
+        assert_matches_reference(index, chunks, query)
+
+def test_scores_follow_removals_and_scopes(monkeypatch):
+    # A small fresh-segment limit exercises both the merged view and the segments added after it
+    monkeypatch.setattr(lexical_index_module, "MAX_FRESH_SEGMENTS", 3)
+    index, chunks, owner = build(random.Random(1))
+    for version in range(0, 20, 3):
+        index.remove(f"vs-{version}")
+        chunks = {chunk_id: text for chunk_id, text in chunks.items() if owner[chunk_id] != f"vs-{version}"}
+        assert_matches_reference(index, chunks, "annual sick leave")
+
+    # A scope keeps the collection-wide scores of the chunks it allows
+    everywhere = {chunk_id: score for score, chunk_id in index.search("annual sick leave payroll", k=len(chunks))}
+    scoped = index.search("annual sick leave payroll", k=len(chunks), vector_store_ids={"vs-1", "vs-4"})
+    assert scoped and {chunk_id: score for score, chunk_id in scoped} == {
+        chunk_id: score for chunk_id, score in everywhere.items() if owner[chunk_id] in ("vs-1", "vs-4")
+    }
+
+def test_segment_files_rebuild_the_same_index():
+    index, chunks, owner = build(random.Random(2), versions=6)
+    files = [index.full_state()]
+    index.mark_saved()
+    index.add("vs-6", [1000, 1001], ["brand new term zebra", "annual leave zebra"])
+    chunks.update({1000: "brand new term zebra", 1001: "annual leave zebra"})
+    index.remove("vs-2")
+    files.append(index.delta_state())
+
+    first_chunks = {}
+    for chunk_id, vs_id in sorted(owner.items(), reverse=True):
+        first_chunks[vs_id] = chunk_id
+    first_chunks["vs-6"] = 1000
+    del first_chunks["vs-2"]
+    live = {chunk_id: text for chunk_id, text in chunks.items() if owner.get(chunk_id) != "vs-2"}
+
+    loaded = LexicalIndex()
+    loaded.apply_files(files, first_chunks)
+    for query in ("zebra", "annual leave", "form 27b"):
+        assert loaded.search(query, k=50) == index.search(query, k=50)
+        assert_matches_reference(loaded, live, query)
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+    assert fused == pytest.approx({"a": 1 / 61 + 1 / 62, "b": 1 / 62, "c": 1 / 63 + 1 / 61})
+    assert sorted(fused, key=fused.get, reverse=True) == ["a", "c", "b"]
+    assert reciprocal_rank_fusion([]) == {}
@@ -0,0 +1,71 @@
+import json
+import os
+
+from app.services.metadata_store import MetadataStore
+
+def file_metadata(filename: str, folder_path: str, content_hash: str) -> dict:
+    """What the JSON registry stored per version (md5 hashes, no hash_algorithm field)"""
+    return {
+        "filename": filename,
+        "folder_path": folder_path,
+        "file_size": 1024,
+        "file_created_at": "2024-01-01T00:00:00+00:00",
+        "file_modified_at": "2024-02-01T00:00:00+00:00",
+        "content_hash": content_hash,
+        "file_extension": filename.rsplit(".", 1)[-1],
+        "file_path": os.path.join("uploads", folder_path, filename),
+    }
+
+LEGACY = {
+    "hr/leave.pdf": [
+        {"vector_store_id": "vs-1", "file_metadata": file_metadata("leave.pdf", "hr", "a" * 32), "chunk_count": 12,
+         "processed_at": "2024-02-01T10:00:00+00:00", "version": 1, "is_latest": False},
+        {"vector_store_id": "vs-2", "file_metadata": file_metadata("leave.pdf", "hr", "b" * 32), "chunk_count": 14,
+         "processed_at": "2024-03-01T10:00:00+00:00", "version": 2, "is_latest": True},
+    ],
+    "it/vpn.docx": [
+        {"vector_store_id": "vs-3", "file_metadata": file_metadata("vpn.docx", "it", "c" * 32), "chunk_count": 3,
+         "processed_at": "2024-02-15T10:00:00+00:00", "version": 1, "is_latest": True},
+    ],
+}
+
+def write_legacy(tmp_path) -> str:
+    json_path = str(tmp_path / "document_metadata.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(LEGACY, f)
+    return json_path
+
+def test_json_registry_is_migrated_once(tmp_path):
+    json_path = write_legacy(tmp_path)
+    store = MetadataStore(str(tmp_path / "metadata.sqlite3"), legacy_json_path=json_path)
+
+    expected = {
+        key: [dict(entry, file_metadata=dict(entry["file_metadata"], hash_algorithm="md5")) for entry in versions]
+        for key, versions in LEGACY.items()
+    }
+    assert store.get_all_versions() == expected
+    assert [(doc["document_key"], doc["vector_store_id"], doc["total_versions"]) for doc in store.get_latest_documents()] == [
+        ("hr/leave.pdf", "vs-2", 2), ("it/vpn.docx", "vs-3", 1)
+    ]
+    assert store.find_stores_by_content("b" * 32, "md5") == [{"vector_store_id": "vs-2", "chunk_count": 14}]
+    assert not store.is_store_referenced("vs-1")
+    assert not os.path.exists(json_path)
+    assert os.path.exists(f"{json_path}.migrated")
+
+    # New versions continue the migrated numbering and reopening never imports again
+    superseded = store.add_version("hr/leave.pdf", {"vector_store_id": "vs-4", "file_metadata": file_metadata("leave.pdf", "hr", "d" * 32)})
+    assert superseded == ["vs-1", "vs-2"]
+    write_legacy(tmp_path)
+    reopened = MetadataStore(str(tmp_path / "metadata.sqlite3"), legacy_json_path=json_path)
+    versions = reopened.get_versions("hr/leave.pdf")
+    assert [(entry["version"], entry["is_latest"]) for entry in versions] == [(1, False), (2, False), (3, True)]
+    assert len(reopened.get_all_versions()) == 2
+    assert os.path.exists(json_path)
+
+def test_unreadable_json_is_left_in_place(tmp_path):
+    json_path = str(tmp_path / "document_metadata.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    store = MetadataStore(str(tmp_path / "metadata.sqlite3"), legacy_json_path=json_path)
+    assert store.get_all_versions() == {}
+    assert os.path.exists(json_path)
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+
+from app.utils import embedding_cache as embedding_cache_module
+from app.utils.embedding_cache import QueryEmbeddingCache, normalize_query
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def test_normalize_query_folds_case_punctuation_and_whitespace():
+    assert normalize_query("  What is the  LEAVE policy?? ") == "what is the leave policy"
+    assert normalize_query("Form 27B, clause 4.2") == normalize_query("form 27b clause 4 2")
+    assert normalize_query("Straße") == normalize_query("STRASSE")
+    assert normalize_query("annual leave") != normalize_query("annual-leaves")
+
+def test_trivially_different_phrasings_share_an_entry(clock):
+    cache = QueryEmbeddingCache("model-a", max_entries=10, ttl_seconds=60)
+    cache.put("What is the leave policy?", np.ones(4))
+    vector = cache.get("what is the LEAVE policy")
+    np.testing.assert_array_equal(vector, np.ones(4, dtype=np.float32))
+    assert vector.dtype == np.float32
+    # Shared by every request that hits it, so it must not be modified in place
+    assert not vector.flags.writeable
+    assert cache.get("what is the sick leave policy") is None
+    # A different model never sees another model's vectors
+    assert QueryEmbeddingCache("model-b", 10, 60).key("leave") != cache.key("leave")
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = QueryEmbeddingCache("model-a", max_entries=10, ttl_seconds=60)
+    cache.put("leave policy", np.ones(4))
+    clock[0] += 60
+    assert cache.get("leave policy") is not None
+    clock[0] += 1
+    assert cache.get("leave policy") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["entries"] == 0
+
+def test_zero_ttl_never_expires(clock):
+    cache = QueryEmbeddingCache("model-a", max_entries=10, ttl_seconds=0)
+    cache.put("leave policy", np.ones(4))
+    clock[0] += 10 ** 9
+    assert cache.get("leave policy") is not None
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = QueryEmbeddingCache("model-a", max_entries=2, ttl_seconds=60)
+    cache.put("first", np.zeros(4))
+    cache.put("second", np.zeros(4))
+    assert cache.get("first") is not None
+    cache.put("third", np.zeros(4))
+    assert cache.get("second") is None
+    assert cache.get("first") is not None and cache.get("third") is not None
+    stats = cache.stats()
+    assert (stats["evictions"], stats["hits"], stats["misses"]) == (1, 3, 1)
+    assert stats["hit_rate"] == 0.75
@@ -0,0 +1,160 @@
+import asyncio
+import io
+import os
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+
+from app.services import document_service as document_service_module
+from app.services import upload_service as upload_service_module
+from app.services.document_service import DocumentService
+from app.services.upload_service import UploadService, UploadQueueFull
+from app.utils.fingerprints import FingerprintJournal
+
+class FakeDocumentService:
+    """Real staging methods of DocumentService, with indexing replaced by a gate the test opens"""
+
+    save_uploaded_file = DocumentService.save_uploaded_file
+    claim_staged_upload = DocumentService.claim_staged_upload
+    discard_staged_upload = DocumentService.discard_staged_upload
+    UPLOAD_BLOCK_SIZE = 1024
+
+    def __init__(self, tmp_path):
+        self.upload_dir = str(tmp_path / "uploads")
+        self.staging_dir = os.path.join(self.upload_dir, ".staging")
+        self._staged_hashes = {}
+        self.fingerprints = FingerprintJournal(str(tmp_path / "file_fingerprints.json"))
+        self.gate = asyncio.Event()
+        self.fail = False
+
+    async def process_upload(self, file_path, folder_path="", progress=None, staged_path=None):
+        if staged_path:
+            self.claim_staged_upload(staged_path, file_path)
+        progress["pages_extracted"] = 1
+        await self.gate.wait()
+        if self.fail:
+            raise RuntimeError("extraction failed")
+        progress["chunks_embedded"] = 3
+        return {"status": "processed", "vector_store_id": "vs-1", "chunk_count": 3}
+
+def upload_file(filename: str, content: bytes):
+    data = io.BytesIO(content)
+
+    async def read(size=-1):
+        return data.read(size)
+
+    return SimpleNamespace(filename=filename, read=read)
+
+@pytest.fixture(autouse=True)
+def catalog(monkeypatch):
+    refreshes = []
+
+    async def refresh_catalog():
+        refreshes.append(True)
+
+    monkeypatch.setattr(upload_service_module, "ingestion_service", SimpleNamespace(refresh_catalog=refresh_catalog))
+    return refreshes
+
+async def wait_for_status(service, job_id, *statuses):
+    for _ in range(200):
+        if service.get_job(job_id)["status"] in statuses:
+            return service.get_job(job_id)
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {statuses}")
+
+def staged_files(documents) -> list:
+    return os.listdir(documents.staging_dir) if os.path.isdir(documents.staging_dir) else []
+
+def test_job_runs_from_staged_upload_to_completed(tmp_path, catalog):
+    async def main():
+        documents = FakeDocumentService(tmp_path)
+        service = UploadService(documents, workers=1, queue_size=4)
+        await service.start()
+        file_path, staged_path = await documents.save_uploaded_file(upload_file("leave.txt", b"leave policy " * 500), "hr")
+        assert not os.path.exists(file_path)
+        assert staged_files(documents) == [os.path.basename(staged_path)]
+
+        job = service.submit(file_path, "leave.txt", "hr", uploaded_by="alice", staged_path=staged_path)
+        assert job["status"] == "queued"
+        running = await wait_for_status(service, job["job_id"], "processing")
+        # Moved into the uploads tree as soon as the job starts, with the hash taken while streaming
+        assert os.path.exists(file_path) and staged_files(documents) == []
+        assert documents.fingerprints.lookup(file_path, os.stat(file_path)) is not None
+        assert running["pages_extracted"] == 1 and running["finished_at"] is None
+
+        documents.gate.set()
+        done = await wait_for_status(service, job["job_id"], "completed")
+        assert (done["vector_store_id"], done["chunk_count"], done["chunks_embedded"]) == ("vs-1", 3, 3)
+        assert done["finished_at"] is not None and done["error"] is None
+        assert catalog == [True]
+        await service.stop()
+        assert not service.is_running
+
+    asyncio.run(main())
+
+def test_failures_are_recorded_on_the_job(tmp_path, catalog):
+    async def main():
+        documents = FakeDocumentService(tmp_path)
+        documents.fail = True
+        documents.gate.set()
+        service = UploadService(documents, workers=1, queue_size=4)
+        await service.start()
+        job = service.submit(os.path.join(documents.upload_dir, "broken.pdf"), "broken.pdf")
+        failed = await wait_for_status(service, job["job_id"], "failed")
+        assert failed["error"] == "extraction failed" and failed["finished_at"] is not None
+        assert catalog == []
+        # The worker survives a failed job
+        assert service.is_running
+        await service.stop()
+
+    asyncio.run(main())
+
+def test_full_queue_rejects_uploads(tmp_path):
+    async def main():
+        documents = FakeDocumentService(tmp_path)
+        service = UploadService(documents, workers=1, queue_size=1)
+        with pytest.raises(UploadQueueFull):
+            service.submit("uploads/a.txt", "a.txt")
+        await service.start()
+        service.submit("uploads/a.txt", "a.txt")
+        await wait_for_status(service, next(iter(service.jobs)), "processing")
+        service.submit("uploads/b.txt", "b.txt")
+        with pytest.raises(UploadQueueFull):
+            service.submit("uploads/c.txt", "c.txt")
+        assert len(service.jobs) == 2
+        documents.gate.set()
+        await service.stop()
+
+    asyncio.run(main())
+
+def test_stop_discards_staged_files_of_unfinished_jobs(tmp_path):
+    async def main():
+        documents = FakeDocumentService(tmp_path)
+        service = UploadService(documents, workers=1, queue_size=4)
+        await service.start()
+        jobs = []
+        for name in ("first.txt", "second.txt"):
+            file_path, staged_path = await documents.save_uploaded_file(upload_file(name, name.encode() * 100))
+            jobs.append(service.submit(file_path, name, staged_path=staged_path))
+        await wait_for_status(service, jobs[0]["job_id"], "processing")
+
+        await service.stop()
+        # The running job already claimed its file, the queued one leaves nothing in staging
+        assert os.path.exists(jobs[0]["file_path"])
+        assert not os.path.exists(jobs[1]["file_path"])
+        assert staged_files(documents) == [] and documents._staged_hashes == {}
+        assert service.get_job(jobs[1]["job_id"])["status"] == "queued"
+
+    asyncio.run(main())
+
+def test_oversized_upload_leaves_nothing_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_service_module.settings, "MAX_UPLOAD_SIZE_MB", 1)
+
+    async def main():
+        documents = FakeDocumentService(tmp_path)
+        with pytest.raises(HTTPException) as error:
+            await documents.save_uploaded_file(upload_file("huge.bin", b"x" * (1024 * 1024 + 1)))
+        assert error.value.status_code == 413
+        assert staged_files(documents) == [] and documents._staged_hashes == {}
+
+    asyncio.run(main())
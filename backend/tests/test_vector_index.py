@@ -0,0 +1,193 @@
+import os
+import asyncio
+import threading
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from app.services import vector_index as vector_index_module
+from app.services.vector_index import VectorIndex, index_kind
+
+DIMENSION = 32
+
+@pytest.fixture
+def ann_settings(monkeypatch):
+    """Small IVF-PQ partitions so a few hundred vectors are enough to train one"""
+    settings = vector_index_module.settings
+    monkeypatch.setattr(settings, "ANN_MIN_VECTORS", 100)
+    monkeypatch.setattr(settings, "IVF_NLIST", 4)
+    monkeypatch.setattr(settings, "IVF_PQ_M", 8)
+    monkeypatch.setattr(settings, "IVF_NPROBE", 4)
+    monkeypatch.setattr(settings, "IVF_TRAINING_SAMPLE", 5000)
+    return settings
+
+def add_stores(index: VectorIndex, stores: int = 3, chunks: int = 200):
+    rng = np.random.default_rng(0)
+    for store in range(stores):
+        vectors = rng.random((chunks, DIMENSION), dtype=np.float32)
+        texts = [f"store {store} chunk {i}" for i in range(chunks)]
+        index.add_store(f"vs-{store}", texts, vectors, [{"folder_path": "hr"}] * chunks)
+
+def partition_ids(index: VectorIndex) -> np.ndarray:
+    partition = index.partitions["hr"]
+    if index_kind(partition) == "ivfpq":
+        invlists = partition.invlists
+        ids = [faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)) for i in range(invlists.nlist)]
+        return np.sort(np.concatenate(ids))
+    return np.sort(faiss.vector_to_array(partition.id_map))
+
+def test_ivfpq_retrain_with_non_contiguous_ids(tmp_path, ann_settings):
+    index = VectorIndex(str(tmp_path), use_mmap=False)
+    add_stores(index)
+    # Removing the middle version leaves a gap in the chunk ids
+    index.remove_store("vs-1")
+    live_ids = index.partition_ids("hr")
+    assert live_ids[-1] - live_ids[0] + 1 > len(live_ids)
+
+    index.build(index_type="ivfpq")
+    assert index_kind(index.partitions["hr"]) == "ivfpq"
+
+    rebuilt = index.build(index_type="ivfpq", retrain=True)
+    assert [entry["to"] for entry in rebuilt] == ["ivfpq"]
+    np.testing.assert_array_equal(partition_ids(index), live_ids)
+
+    index.save()
+    reloaded = VectorIndex(str(tmp_path), use_mmap=False)
+    assert index_kind(reloaded.partitions["hr"]) == "ivfpq"
+    assert reloaded.ntotal == len(live_ids)
+
+def test_ivfpq_back_to_flat(tmp_path, ann_settings):
+    index = VectorIndex(str(tmp_path), use_mmap=False)
+    add_stores(index)
+    index.remove_store("vs-1")
+    live_ids = index.partition_ids("hr")
+    index.build(index_type="ivfpq")
+    index.save()
+
+    reloaded = VectorIndex(str(tmp_path))
+    rebuilt = reloaded.build(index_type="flat")
+    assert [(entry["from"], entry["to"]) for entry in rebuilt] == [("ivfpq", "flat")]
+    assert index_kind(reloaded.partitions["hr"]) == "flat"
+    np.testing.assert_array_equal(partition_ids(reloaded), live_ids)
+
+    query = np.random.default_rng(1).random(DIMENSION, dtype=np.float32)
+    hits = reloaded.search_ids(query, k=5)
+    assert len(hits) == 5
+    assert set(chunk_id for _, chunk_id in hits) <= set(live_ids.tolist())
+
+def test_writers_take_turns(tmp_path):
+    """Two indexes over one directory (as two workers would have) never lose each other's saves"""
+    first = VectorIndex(str(tmp_path), use_mmap=False)
+    second = VectorIndex(str(tmp_path), use_mmap=False)
+    vectors = np.random.default_rng(2).random((4, DIMENSION), dtype=np.float32)
+    adopted = []
+
+    def write_second():
+        with second.writer():
+            # The second writer adopted the first one's generation before modifying it
+            adopted.append(second.has_store("vs-first"))
+            second.add_store("vs-second", ["c", "d"], vectors[2:], [{}] * 2)
+            second.save()
+
+    first.acquire_writer()
+    waiter = threading.Thread(target=write_second)
+    waiter.start()
+    waiter.join(timeout=0.5)
+    assert waiter.is_alive()
+
+    first.add_store("vs-first", ["a", "b"], vectors[:2], [{}] * 2)
+    first.save()
+    first.release_writer()
+    waiter.join(timeout=5)
+    assert not waiter.is_alive()
+    assert adopted == [True]
+
+    reloaded = VectorIndex(str(tmp_path), use_mmap=False)
+    assert set(reloaded.store_ids()) == {"vs-first", "vs-second"}
+    assert reloaded.get_chunk(reloaded.store_chunks["vs-first"][0])["content"] == "a"
+    # One chunk table and blob per save, the second appended to the first
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("chunks")]) == 4
+    assert reloaded.lexical.search("c", 1)[0][1] == reloaded.store_chunks["vs-second"][0]
+
+def test_writer_lock_belongs_to_one_task(tmp_path):
+    """Within a process the lock is re-entrant for the task holding it and exclusive against other tasks"""
+    index = VectorIndex(str(tmp_path), use_mmap=False)
+    order = []
+
+    async def write(name: str):
+        token = await asyncio.to_thread(index.lock_writer)
+        index.claim_writer(token)
+        try:
+            order.append(f"{name} start")
+            # Work handed to a thread by the holder re-enters the lock instead of waiting for it
+            await asyncio.to_thread(index.save)
+            await asyncio.sleep(0.05)
+            order.append(f"{name} end")
+        finally:
+            index.release_writer()
+
+    async def main():
+        await asyncio.wait_for(asyncio.gather(write("a"), write("b")), timeout=5)
+
+    asyncio.run(main())
+    assert order in (["a start", "a end", "b start", "b end"], ["b start", "b end", "a start", "a end"])
+    assert not index.holds_writer()
+    with pytest.raises(RuntimeError):
+        index.release_writer()
+
+def test_saves_append_to_the_chunk_and_keyword_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index_module, "MAX_SEGMENT_FILES", 4)
+    index = VectorIndex(str(tmp_path), use_mmap=False)
+    reader = VectorIndex(str(tmp_path), use_mmap=False)
+    vectors = np.random.default_rng(3).random((2, DIMENSION), dtype=np.float32)
+
+    for store in range(3):
+        index.add_store(f"vs-{store}", [f"alpha{store} shared", f"beta{store} shared"], vectors, [{}] * 2)
+        index.save()
+        # Each save only wrote what it added
+        assert len(index.chunk_files) == len(index.lexical_files) == store + 1
+        assert reader.refresh()
+        assert set(reader.store_ids()) == {f"vs-{i}" for i in range(store + 1)}
+        assert reader.lexical.search(f"beta{store}", 1)[0][1] == index.store_chunks[f"vs-{store}"][1]
+
+    # A removed version disappears from the keyword index of processes picking up the save
+    index.remove_store("vs-1")
+    index.save()
+    assert reader.refresh()
+    assert reader.lexical.search("alpha1", 5) == []
+    assert len(reader.lexical.search("shared", 10)) == 4
+
+    assert len(index.chunk_files) == len(index.lexical_files) == 3
+
+    # Hitting the file limit rewrites the live content into one file of each
+    index.add_store("vs-3", ["gamma shared"], vectors[:1], [{}])
+    index.save()
+    assert len(index.chunk_files) == len(index.lexical_files) == 4
+    index.add_store("vs-4", ["delta shared"], vectors[:1], [{}])
+    index.save()
+    assert len(index.chunk_files) == len(index.lexical_files) == 1
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("lexical")]) == 1
+
+    reloaded = VectorIndex(str(tmp_path), use_mmap=False)
+    assert set(reloaded.store_ids()) == {"vs-0", "vs-2", "vs-3", "vs-4"}
+    assert len(reloaded.lexical.search("shared", 10)) == 6
+    assert reloaded.get_chunk(reloaded.store_chunks["vs-3"][0])["content"] == "gamma shared"
+    assert reloaded.get_chunk(reloaded.store_chunks["vs-0"][1])["content"] == "beta0 shared"
+
+def test_equal_distances_keep_the_lowest_chunk_ids(tmp_path):
+    """Ties at the k-th distance are broken by chunk id, whatever order a partition returns them in"""
+    index = VectorIndex(str(tmp_path), use_mmap=False)
+    vector = np.ones(DIMENSION, dtype=np.float32)
+    index.add_store("vs-a", ["a0", "a1", "a2"], np.stack([vector] * 3), [{"folder_path": "hr"}] * 3)
+    index.add_store("vs-b", ["b0", "b1", "b2"], np.stack([vector] * 3), [{"folder_path": "it"}] * 3)
+    expected = [(0.0, chunk_id) for chunk_id in sorted(index.partition_ids("hr").tolist() + index.partition_ids("it").tolist())[:4]]
+
+    for partition in ("hr", "it"):
+        # Same vectors re-added with the lowest id last, as FAISS may return ties in any order
+        ids = index.partition_ids(partition)[[1, 2, 0]].copy()
+        rebuilt = faiss.IndexIDMap2(faiss.IndexFlatL2(DIMENSION))
+        rebuilt.add_with_ids(np.stack([vector] * len(ids)), ids)
+        index.partitions[partition] = rebuilt
+
+    assert index.search_ids(vector, k=4) == expected